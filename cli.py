@@ -5,35 +5,56 @@ import sys
 from models.globals import *
 
 import socket
+import time
 
 
 from models.helpers import WorkflowParser
+from models.history import HISTORY
+from models.metrics import METRICS
+from models.output import OUTPUT
+from models.recorder import RECORDER
+from models.results import RESULTS
+from models.tracing import TRACER
 from models.operator import Operator
 from models.settings import Configuration
-from models.workflow import Workflow
+from models.manifest import WorkflowManifest
 from models.globals import SUPPORTED_WORKFLOWS
 
+_workflows_loaded = False
+
 def load_workflows():
-    global SUPPORTED_WORKFLOWS
-    for service in ["cta", "enstore"]:
-        printv(f"Checking if workflows exist for: {service}...")
-        if os.path.exists(f"tests/{service}/scripts/workflows.json"):
-            printv(f"Workflows exist, loading workflows for {service}.")
-            with open(f"tests/{service}/scripts/workflows.json", "r") as f:
-                workflows = json.load(f)
-                for name, definition in workflows.items():
-                    SUPPORTED_WORKFLOWS[service][name] = Workflow(definition)
+    """Loads each service's compiled workflow manifest once, on first use; --cmd and --help never need them"""
+    global SUPPORTED_WORKFLOWS, _workflows_loaded
+    if _workflows_loaded:
+        return
+    _workflows_loaded = True
+    with TRACER.span("load_workflows"):
+        for service in ["cta", "enstore"]:
+            printv(f"Checking if workflows exist for: {service}...")
+            SUPPORTED_WORKFLOWS[service] = WorkflowManifest.load(service)
 
 class SDSAdminCLI:
     def __init__(self):
-        load_workflows()
         self.parser, self.cta_parser, self.enstore_parser = self.get_arg_parser()
         
     def get_arg_parser(self):
         # Create the parser
         parser = argparse.ArgumentParser(description="Storage Operations Testing Suite")
         parser.add_argument('-u', '--user', default='root', help="User to log in as on remote nodes (default: root).")
-        parser.add_argument('-n', '--node', default=socket.gethostname(), help="Node to run tests on (default: local).")
+        parser.add_argument(
+            '-n',
+            '--node',
+            default=socket.gethostname(),
+            help="Node(s) to run tests on: a comma-separated list, where '@name' expands to a host group from server_specs.json (default: local)."
+        )
+        parser.add_argument(
+            '-s',
+            '--select',
+            nargs='+',
+            metavar='KEY=VALUE',
+            help="Run on every node in server_specs.json matching all selectors (service, device, mover, group); overrides -n."
+        )
+        parser.add_argument('-j', '--jobs', type=int, default=8, help="Maximum number of nodes to run on concurrently (default: 8).")
         parser.add_argument(
             "--filter",
             default=None,
@@ -49,6 +70,26 @@ class SDSAdminCLI:
         )
         parser.add_argument('-r', '--run', help="Run the specified test.")
         parser.add_argument('-c', '--cmd', nargs='+', help="Run custom command(s) sequentially.")
+        parser.add_argument('--rediscover', action='store_true', help="Ignore cached service/mover detection and probe remote nodes again.")
+        parser.add_argument(
+            '--mover-policy',
+            choices=['prompt', 'first', 'none', 'all'],
+            default=None,
+            help="How to pick a mover when a node has several: ask, take the first, none, or run --run workflows on all tape drives in parallel (default: prompt on a terminal, otherwise first)."
+        )
+        parser.add_argument('--timeout', type=float, default=None, metavar="SECONDS", help="Kill --cmd commands or a single-command --run workflow still running after this many seconds and fail the run (not with --stream or --save-results; step workflows ignore it).")
+        parser.add_argument('--stream', action='store_true', help="Print command output live as it arrives.")
+        parser.add_argument('--spool', default=None, help="File to append streamed command output to (requires --stream).")
+        recording = parser.add_mutually_exclusive_group()
+        recording.add_argument('--record', default=None, metavar="FIXTURES", help="Record every command's output, exit code and timing to this JSON fixture file (add --rediscover to capture detection too).")
+        recording.add_argument('--replay', default=None, metavar="FIXTURES", help="Replay command output from a fixture file written by --record instead of running anything.")
+        parser.add_argument('--metrics-file', default=None, help="Write run metrics to this node_exporter textfile (.prom) at exit (default: $SDS_METRICS_FILE).")
+        parser.add_argument('--metrics-port', type=int, default=None, help="Serve run metrics over HTTP on this local port while the run lasts. The server stops when the run exits, so a Prometheus scrape can miss short runs; for those use --metrics-file with node_exporter's textfile collector.")
+        parser.add_argument('--profile', default=None, metavar="TRACE", help="Write a Chrome/Perfetto trace of every phase, subprocess and ssh call to this JSON file.")
+        parser.add_argument('--cprofile', default=None, metavar="STATS", help="With --profile, also write cProfile stats to this file (read with python -m pstats).")
+        parser.add_argument('--save-results', action='store_true', help="Spool every command's full output to per-node, per-step files for `results search` as it arrives; only the last 1000 lines of each are kept for the console.")
+        parser.add_argument('--compress-results', action='store_true', help="Gzip spooled results (requires --save-results).")
+        parser.add_argument('--output', choices=['text', 'json'], default='text', help="Console output format; json writes one object per line tagged with node, mover and step (default: text).")
         parser.add_argument('-q', '--quiet', action='store_true', help="Doesn't print anything.")
         parser.add_argument('-v', '--verbose', action='store_true',  help="Prints detailed output.")
         
@@ -57,6 +98,26 @@ class SDSAdminCLI:
         # Detects the systems installed on this machine
         subparsers.add_parser('auto', help="Detects the service applicable to this node (default).")
 
+        # Search over outputs spooled with --save-results
+        results_parser = subparsers.add_parser('results', help="Search command output saved with --save-results (-n filters by node).")
+        results_actions = results_parser.add_subparsers(dest="action", required=True)
+        results_search = results_actions.add_parser('search', help="Print saved output lines matching PATTERN.")
+        results_search.add_argument('pattern', help="Regular expression to search for.")
+        results_search.add_argument('-i', '--ignore-case', action='store_true', help="Case-insensitive search.")
+        results_search.add_argument('--limit', type=int, default=None, help="Stop after this many matching lines.")
+        results_list = results_actions.add_parser('list', help="Print the saved steps.")
+        for results_action in [results_search, results_list]:
+            results_action.add_argument('-w', '--workflow', default=None, help="Only this workflow ('cmd' for --cmd runs).")
+            results_action.add_argument('--run-id', default=None, help="Only this run.")
+
+        # Regression check against recorded run history
+        compare_parser = subparsers.add_parser('compare', help="Flag statistically significant slowdowns in recorded runs.")
+        compare_parser.add_argument('-w', '--workflow', default=None, help="Only compare this workflow ('cmd' for all --cmd runs, each command being its own series).")
+        compare_parser.add_argument('--baseline', type=int, default=20, help="Runs before the recent window used as the baseline (default: 20).")
+        compare_parser.add_argument('--recent', type=int, default=5, help="Most recent runs compared against the baseline (default: 5).")
+        compare_parser.add_argument('--alpha', type=float, default=0.05, help="Significance level for Welch's t-test (default: 0.05).")
+        compare_parser.add_argument('--threshold', type=float, default=5.0, help="Minimum slowdown in percent to flag (default: 5).")
+
         # CTA Testing Suite Parser
         cta_parser = subparsers.add_parser('cta', help="CTA Testing Suite")
         cta_parser.add_argument('-d', '--device', choices=['tape', 'disk'], required=True, help="Device type.")
@@ -93,6 +154,7 @@ class SDSAdminCLI:
             def __call__(  # type: ignore
                 self: "_ListWorkflows", parser, args, values, option_string=None
             ) -> None:
+                load_workflows()
                 filter_args = SDSAdminCLI.get_filter_args()
                 filter_str = (
                     f' (filtering for "{filter_args.filter}")'
@@ -104,12 +166,9 @@ class SDSAdminCLI:
                     print(
                     f"""\n******************************** All supported {service} workflows{filter_str} ********************************"""
                 )
-                    for name, workflow in SUPPORTED_WORKFLOWS[service].items():
-                        if filter_args.filter:
-                            if filter_args.filter.lower() in name.lower():
-                                workflow.get_description()
-                        else:
-                            workflow.get_description()
+                    manifest = SUPPORTED_WORKFLOWS[service]
+                    for name in manifest.search(filter_args.filter):
+                        print(manifest.descriptions[name])
 
                 sys.exit(0)
 
@@ -120,6 +179,7 @@ class SDSAdminCLI:
             def __call__(  # type: ignore
                 self: "_WorkflowParams", parser, args, values, option_string=None
             ) -> None:
+                load_workflows()
                 try:
                     # Finds workflow inherited class in dictionary if exists, and initializes it.
                     for service in ["cta", "enstore"]:
@@ -135,44 +195,154 @@ class SDSAdminCLI:
         return _WorkflowParams
 
 
-def main(extra_args=None):
-    admin_cli = SDSAdminCLI()
-    args, operator_args = admin_cli.parser.parse_known_args()
-    extra_args = None
-    set_quiet_mode(args.quiet)
-    set_verbose_mode(args.verbose)
-        
-    if args.suite == "cta":
-        extra_args = admin_cli.cta_parser.parse_args()
-    elif args.suite == "enstore":
-        extra_args = admin_cli.enstore_parser.parse_args()
-        
-    ops = Operator(args, extra_args)
+def run_node(admin_cli, args, extra_args, operator_args, defer_output=False):
+    with TRACER.span("run_node", node=args.node):
+        return _run_node(admin_cli, args, extra_args, operator_args, defer_output)
+
+
+def _run_node(admin_cli, args, extra_args, operator_args, defer_output=False):
+    start = time.monotonic()
+    with TRACER.span("Operator"):
+        ops = Operator(args, extra_args)
+    ops.defer_output = defer_output
     
-    if not ops.valid and args.node:
-        ops.detect_remote_service(args)
-    elif not ops.valid and args.suite is None:
-        ops.detect_service(args)
-    elif not ops.valid and extra_args:
-        ops.config = Configuration(args.node, args.suite, extra_args.device, extra_args.mover)
+    with TRACER.span("detect_service"):
+        if not ops.valid and args.node:
+            ops.detect_remote_service(args)
+        elif not ops.valid and args.suite is None:
+            ops.detect_service(args)
+        elif not ops.valid and extra_args:
+            ops.config = Configuration(args.node, args.suite, extra_args.device, extra_args.mover)
     
     if ops.config and ops.config.service == "cta" or args.suite == "cta":
         ops.parser = admin_cli.cta_parser
     elif ops.config and ops.config.service == "enstore" or args.suite == "enstore":
         ops.parser = admin_cli.enstore_parser
     
-    if ops.valid:
+    if ops.valid and not defer_output:
         print(ops.config.get())
-    if args.cmd:
+    if args.cmd and args.timeout:
+        import asyncio
+        
+        asyncio.run(ops.arun_command(args.cmd, timeout=args.timeout))
+    elif args.cmd:
         ops.run_command(args.cmd)
     elif args.run:
+        load_workflows()
         if args.run in SUPPORTED_WORKFLOWS[ops.config.service]:
             workflow = SUPPORTED_WORKFLOWS[ops.config.service][args.run]
-            workflow_params, _ = workflow.parser.parse_known_args(operator_args)
-            workflow.run(ops, workflow_params)
+            with TRACER.span("parse_workflow_args", workflow=args.run):
+                workflow_params, _ = workflow.parser.parse_known_args(operator_args)
+            if ops.mover_policy == "all":
+                if not ops.movers:
+                    # Nodes configured from server_specs.json skip detection, but their movers are still needed
+                    ops.detect_movers(args)
+                if not ops.tape_movers():
+                    print(f"Warning: --mover-policy all found no tape drives on {ops.config.node}, running once with the configured device")
+            if ops.mover_policy == "all" and len(ops.tape_movers()) > 1:
+                from models.executor import FanOut
+                
+                results = ops.run_on_movers(workflow, workflow_params)
+                ops.mover_results = results
+                failed = [f"{slot} ({result.error})" for slot, result in results.items() if not result.ok]
+                if failed:
+                    ops.error = f"mover(s) failed: {', '.join(failed)}"
+                if not defer_output:
+                    FanOut.print_summary(results, label="mover")
+                return ops
+            elif args.timeout:
+                import asyncio
+                
+                asyncio.run(workflow.arun(ops, workflow_params, timeout=args.timeout))
+            else:
+                workflow.run(ops, workflow_params)
         #ops.run_tests(args.run)
     else:
         ops.parser.print_help()
+        return ops
+    if ops.steps:
+        HISTORY.record(ops, args.run, time.monotonic() - start)
+    return ops
+
+
+def main(extra_args=None):
+    admin_cli = SDSAdminCLI()
+    args, operator_args = admin_cli.parser.parse_known_args()
+    extra_args = None
+    if args.spool and not args.stream:
+        admin_cli.parser.error("--spool requires --stream")
+    if args.compress_results and not args.save_results:
+        admin_cli.parser.error("--compress-results requires --save-results")
+    if args.timeout is not None and (args.stream or args.save_results):
+        admin_cli.parser.error("--timeout cannot be combined with --stream or --save-results")
+    OUTPUT.install(args.output)
+    set_quiet_mode(args.quiet)
+    set_verbose_mode(args.verbose)
+    if args.profile:
+        TRACER.start(args.profile, args.cprofile)
+    if args.record or args.replay:
+        RECORDER.start("record" if args.record else "replay", args.record or args.replay)
+    if args.save_results:
+        RESULTS.enable(args.compress_results)
+    if args.metrics_file:
+        METRICS.export_on_exit(args.metrics_file)
+    if args.metrics_port is not None:
+        METRICS.serve(args.metrics_port)
+        
+    if args.suite == "cta":
+        extra_args = admin_cli.cta_parser.parse_args()
+    elif args.suite == "enstore":
+        extra_args = admin_cli.enstore_parser.parse_args()
+    
+    if args.suite == "results":
+        node = None if args.node == socket.gethostname() else args.node
+        if args.action == "list":
+            for entry in RESULTS.entries(node, args.workflow, args.run_id):
+                print(f"{entry['run']} {entry.get('node')} {entry.get('workflow')} {entry['path']} {entry['lines']} lines  exit {entry.get('exit_code')}")
+            return
+        matches = 0
+        for match in RESULTS.search(args.pattern, node, args.workflow, args.run_id, args.ignore_case, args.limit):
+            RESULTS.print_match(match)
+            matches += 1
+        if not matches:
+            sys.exit(1)
+        return
+    
+    if args.suite == "compare":
+        node = None if args.node == socket.gethostname() else args.node
+        findings = HISTORY.compare(args.workflow, node, args.baseline, args.recent, args.alpha, args.threshold / 100)
+        HISTORY.print_comparison(findings)
+        if any(finding["regression"] for finding in findings):
+            sys.exit(1)
+        return
+    
+    if args.select:
+        nodes = Configuration.select_nodes(args.select)
+        if not nodes:
+            print(f"No nodes match: {' '.join(args.select)}")
+            sys.exit(1)
+    else:
+        with TRACER.span("resolve_nodes", expression=args.node):
+            nodes = Configuration.resolve_nodes(args.node)
+    if len(nodes) <= 1:
+        args.node = nodes[0] if nodes else socket.gethostname()
+        ops = run_node(admin_cli, args, extra_args, operator_args)
+        if ops.error:
+            sys.exit(1)
+    elif not (args.cmd or args.run):
+        admin_cli.parser.print_help()
+    else:
+        from models.executor import FanOut
+        
+        def task(node):
+            node_args = argparse.Namespace(**vars(args))
+            node_args.node = node
+            return run_node(admin_cli, node_args, extra_args, operator_args, defer_output=True)
+        
+        results = FanOut(nodes, args.jobs).run(task)
+        FanOut.print_summary(results)
+        if not all(result.ok for result in results.values()):
+            sys.exit(1)
         
 
 if __name__ == "__main__":
@@ -2,3 +2,25 @@ import os
 
 SPECTRA_CONFIG = f"{os.getcwd()}/config/spectra.ini"
 SERVER_SPECS = f"{os.getcwd()}/config/server_specs.json"
+
+# Seconds a shared ssh session may sit idle before it is closed
+SSH_IDLE_TIMEOUT = int(os.environ.get("SDS_SSH_IDLE_TIMEOUT", 300))
+
+# Where discovery results and other TTL caches are kept between runs
+CACHE_DIR = os.environ.get("SDS_CACHE_DIR", os.path.expanduser("~/.cache/sds_testing_suite"))
+
+# Seconds a remote node's detected service and movers are trusted before probing again
+DETECTION_TTL = int(os.environ.get("SDS_DETECTION_TTL", 86400))
+
+# Append-only log of every run, used by `cli.py compare`
+HISTORY_FILE = os.environ.get("SDS_HISTORY_FILE", os.path.expanduser("~/.local/share/sds_testing_suite/history.jsonl"))
+
+# Fixture file that executed commands are recorded to, or replayed from instead of running them
+RECORD_FILE = os.environ.get("SDS_RECORD")
+REPLAY_FILE = os.environ.get("SDS_REPLAY")
+
+# node_exporter textfile (.prom) that run metrics are written to at exit
+METRICS_FILE = os.environ.get("SDS_METRICS_FILE")
+
+# Where --save-results spools per-node, per-step command output for `cli.py results search`
+RESULTS_DIR = os.environ.get("SDS_RESULTS_DIR", os.path.expanduser("~/.local/share/sds_testing_suite/results"))
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import signal
+import time
+
+from models.errors import ExecutionError
+from models.helpers import SSH_POOL, Runner
+from models.recorder import RECORDER
+
+# Exit code reported for a command killed at its timeout, as timeout(1) does
+TIMEOUT_EXIT_CODE = 124
+
+
+async def run_shell(cmd, timeout=None, semaphore=None):
+    """Runs a shell command on the event loop and returns (returncode, stdout, stderr).
+
+    Args:
+        cmd (str): Shell command line, run through /bin/sh like subprocess's shell=True.
+        timeout (float, optional): Seconds before the process is killed and asyncio.TimeoutError raised.
+        semaphore (asyncio.Semaphore, optional): Bounds how many commands run at once.
+
+    The command and its children are killed if the calling task is cancelled or times out.
+    """
+    if semaphore:
+        async with semaphore:
+            return await run_shell(cmd, timeout)
+    process = await asyncio.create_subprocess_exec(
+        "/bin/sh", "-c", cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        # Its own session, so children of the shell holding the pipes are killed with it
+        start_new_session=True,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        if process.returncode is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        raise
+    return process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+class AsyncRunner(Runner):
+    """Asyncio counterpart of Runner, same local/remote and load_env semantics"""
+
+    def __init__(self, config, user="root", pool=SSH_POOL, semaphore=None):
+        super().__init__(config, user, pool)
+        self.semaphore = semaphore
+
+    async def run(self, timeout=None):
+        """Runs the commands and returns (description, stdout, stderr), like Runner.run.
+
+        Args:
+            timeout (float, optional): Seconds to wait before the command is killed.
+        """
+        cmd = self.build()
+        
+        async def execute():
+            returncode, stdout, stderr = await run_shell(cmd, timeout, self.semaphore)
+            return {"stdout": stdout, "stderr": stderr, "returncode": returncode}
+        
+        start = time.monotonic()
+        try:
+            with self.span(lane=f"task-{id(asyncio.current_task())}"):
+                response = await RECORDER.aintercept("runner", self.recorded_command(), execute, self.node)
+            self.returncode, stdout, stderr = response["returncode"], response["stdout"], response["stderr"]
+            self.observe(time.monotonic() - start)
+        except asyncio.TimeoutError:
+            self.returncode = TIMEOUT_EXIT_CODE
+            self.observe(time.monotonic() - start)
+            return f"Command timed out after {timeout}s: {cmd}", None, None
+        
+        if not stdout and not stderr:
+            raise ExecutionError(cmd)
+        
+        return f"Ran: {cmd}", stdout, stderr
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Optional
+
+from config import CACHE_DIR as _CACHE_DIR
+from models.globals import printv
+
+
+class TTLCache:
+    """JSON-backed on-disk cache where every entry expires after a time-to-live"""
+
+    def __init__(self, namespace: str, ttl: float, directory: str = _CACHE_DIR) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.directory = os.path.join(directory, namespace)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha1(key.encode()).hexdigest()}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value for key, or None if it is missing or expired"""
+        try:
+            with open(self._path(key), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        age = time.time() - entry.get("created", 0)
+        if entry.get("key") != key or age > self.ttl:
+            printv(f"Cache miss ({self.namespace}): {key}")
+            return None
+        printv(f"Cache hit ({self.namespace}): {key} | age: {age:.0f}s")
+        return entry.get("value")
+
+    def set(self, key: str, value: Any) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"key": key, "created": time.time(), "value": value}, f)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def invalidate(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+            printv(f"Cache invalidated ({self.namespace}): {key}")
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
@@ -31,4 +31,11 @@ class ExecutionError(Exception):
             super().__init__(f"ExecutionError | No command specified")
         else:
             super().__init__(f"ExecutionError | Command Failed, please review | Command: {cmd}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+class ReplayError(Exception):
+    """Exception raised when a replayed command has no recorded response."""
+    def __init__(self, cmd=None, fixtures=None):
+        super().__init__(f"ReplayError | No recorded response in {fixtures} | Command: {cmd}")
+        print(self)
+        sys.exit(1)
@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from models.globals import printv
+from models.output import current_tags, tagged
+
+
+class NodeResult:
+    """Outcome of running a task on a single node (or a single mover on a node)"""
+
+    def __init__(self, node: str) -> None:
+        self.node = node
+        self.operator: Any = None
+        self.error: Optional[str] = None
+        self.elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def results(self) -> List[Any]:
+        return self.operator.results if self.operator else []
+
+
+class FanOut:
+    """Runs the same task on many nodes (or movers) with bounded concurrency"""
+
+    def __init__(self, nodes: List[str], max_workers: int = 8, label: str = "node") -> None:
+        self.nodes = nodes
+        self.label = label
+        self.max_workers = max(1, min(max_workers, len(nodes) or 1))
+
+    def _run_one(self, node: str, task: Callable[[str], Any], tags: Optional[Dict[str, str]] = None) -> NodeResult:
+        result = NodeResult(node)
+        start = time.monotonic()
+        try:
+            with tagged(tags, **{self.label: node}):
+                result.operator = task(node)
+            # A task can also report failure on its operator, e.g. when some of a node's movers failed
+            result.error = getattr(result.operator, "error", None)
+        except SystemExit as e:
+            # models.errors exceptions exit the interpreter, keep that from killing the sweep
+            result.error = f"exited with status {e.code}"
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+        result.elapsed = time.monotonic() - start
+        return result
+
+    def run(self, task: Callable[[str], Any]) -> Dict[str, NodeResult]:
+        """Runs task(node) on every node and collects the results.
+
+        Args:
+            task (callable): Takes a node name and returns the Operator used for it.
+
+        Returns:
+            dict: NodeResult objects keyed by node, in the order the nodes were given.
+        """
+        printv(f"Fanning out to {len(self.nodes)} {self.label}(s) with {self.max_workers} worker(s)")
+        collected = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._run_one, node, task, current_tags()): node for node in self.nodes}
+            for future in as_completed(futures):
+                result = future.result()
+                printv(f"{result.node} finished in {result.elapsed:.2f}s ({'ok' if result.ok else result.error})")
+                collected[result.node] = result
+        return {node: collected[node] for node in self.nodes}
+
+    @staticmethod
+    def print_summary(results: Dict[str, NodeResult], label: str = "node") -> None:
+        for result in results.values():
+            if result.operator and not result.operator.stream:
+                result.operator.print_results()
+        failed = [result for result in results.values() if not result.ok]
+        print(f"\n****************************************************")
+        print(f"    Fan-out Summary: {len(results) - len(failed)}/{len(results)} {label}(s) succeeded")
+        print(f"****************************************************")
+        for result in results.values():
+            status = "ok" if result.ok else f"FAILED ({result.error})"
+            print(f"    {result.node:<30} {result.elapsed:>8.2f}s  {status}")
+        print(f"****************************************************\n")
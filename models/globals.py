@@ -1,9 +1,7 @@
-import builtins
 import json
 import os
 
-# Save the original print function
-original_print = builtins.print
+from models.output import OUTPUT
 
 # Global variables for quiet and verbose modes
 quiet = False
@@ -12,35 +10,21 @@ verbose = False
 SUPPORTED_WORKFLOWS = {
     "cta": {},
     "enstore": {}
-}                    
+}
 
-def custom_print(*args, **kwargs):
-    global quiet
-    # Check quiet mode
-    if quiet:
-        return  # Do not print anything if in quiet mode
-    else:
-        modified_args = list(args)
-    # Call the original print function
-    original_print(*modified_args, **kwargs)
-
-def printv(*args, **kwargs):
-    global verbose
-    # Check verbose mode
+def printv(*args, sep=" ", end="\n", **kwargs):
+    # Checked here first so disabled verbose output costs a single flag test
     if not verbose:
         return
-    # Call the original print function
-    modified_args = ["\n[Verbose]"] + list(args)
-    custom_print(*modified_args, **kwargs)
-    
-# Replace the built-in print with the custom print
-builtins.print = custom_print
+    OUTPUT.emit(args, level="verbose", sep=sep, end=end)
 
 # Functions to set quiet and verbose modes
 def set_quiet_mode(value):
     global quiet
     quiet = value
+    OUTPUT.quiet = value
 
 def set_verbose_mode(value):
     global verbose
-    verbose = value
\ No newline at end of file
+    verbose = value
+    OUTPUT.verbose = value
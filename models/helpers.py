@@ -1,20 +1,123 @@
+import atexit
+import hashlib
+import os
+import queue
+import shutil
+import signal
 import subprocess
 import argparse
+import tempfile
 import textwrap
+import threading
+import time
+from collections import deque
 from typing import Any, List, Dict
 
 
+from config import SSH_IDLE_TIMEOUT as _SSH_IDLE_TIMEOUT
 from models.errors import ExecutionError
+from models.globals import printv
+from models.metrics import METRICS
+from models.output import current_tags
+from models.recorder import RECORDER
+from models.tracing import TRACER
+
+
+class SSHConnectionPool:
+    """Multiplexed ssh sessions (ControlMaster) keyed by user@node, shared by every Runner in the process"""
+
+    def __init__(self, idle_timeout=_SSH_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.control_dir = None
+        self._last_used = {}
+        self._lock = threading.Lock()
+        atexit.register(self.close_all)
+
+    def control_path(self, target):
+        with self._lock:
+            if not self.control_dir:
+                self.control_dir = tempfile.mkdtemp(prefix="sds-ssh-")
+        # Unix socket paths are limited to ~100 characters, so hash the target
+        return os.path.join(self.control_dir, hashlib.sha1(target.encode()).hexdigest()[:16])
+
+    def is_open(self, target):
+        with self._lock:
+            return target in self._last_used
+
+    def options(self, target):
+        """Returns the ssh options that attach to (or start) the shared session for target"""
+        self.evict_idle()
+        with self._lock:
+            if target not in self._last_used:
+                printv(f"Opening shared ssh session: {target}")
+            self._last_used[target] = time.monotonic()
+        return (
+            f"-o ControlMaster=auto -o ControlPath={self.control_path(target)} "
+            f"-o ControlPersist={self.idle_timeout}s"
+        )
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [target for target, used in self._last_used.items() if now - used > self.idle_timeout]
+        for target in idle:
+            self.close(target)
+
+    def close(self, target):
+        with self._lock:
+            if self._last_used.pop(target, None) is None:
+                return
+        printv(f"Closing shared ssh session: {target}")
+        subprocess.run(
+            ["ssh", "-o", f"ControlPath={self.control_path(target)}", "-O", "exit", target],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def close_all(self):
+        for target in list(self._last_used):
+            self.close(target)
+        if self.control_dir:
+            shutil.rmtree(self.control_dir, ignore_errors=True)
+            self.control_dir = None
+
+
+SSH_POOL = SSHConnectionPool()
+
+# Streaming limits: lines buffered between the pipe readers and the consumer,
+# how much of a line is read at once, and lines of each pipe kept for the caller.
+_STREAM_QUEUE_SIZE = 1024
+_STREAM_LINE_LIMIT = 65536
+_STREAM_TAIL_LINES = 1000
+
+_COMMAND_SECONDS = METRICS.histogram("sds_command_duration_seconds", "Wall time of commands run through Runner.", ["node"])
+_COMMANDS = METRICS.counter("sds_commands", "Commands run through Runner, by exit status.", ["node", "status"])
+_SSH_SETUP_SECONDS = METRICS.histogram(
+    "sds_ssh_session_setup_seconds", "Wall time of the first command on a new shared ssh session, including the handshake.", ["node"]
+)
+
+
+def _spool_paths(spool):
+    if not spool:
+        return []
+    return [spool] if isinstance(spool, str) else [path for path in spool if path]
+
 
 class Runner:
-    def __init__(self, config, user="root"):
+    def __init__(self, config, user="root", pool=SSH_POOL):
         self.command = []
+        # Metrics are labelled with the bare node name, like the workflow and detection metrics
+        self.host = config.node
         self.remote = config.is_remote()
         if self.remote:
             self.node = f"{user}@{config.node}"
-            self.command.append(f"ssh -Ktx {self.node} '")
+            self.new_session = bool(pool) and not pool.is_open(self.node)
+            options = f"{pool.options(self.node)} " if pool else ""
+            self.command.append(f"ssh -Ktx {options}{self.node} '")
         else:
             self.node = None
+            self.new_session = False
+        self.returncode = None
         self.load_env(config.service)
         
     def load_env(self, service):
@@ -30,25 +133,191 @@ class Runner:
         for command in commands:
             self.command.append(command)
     
-    def run(self):
-        cmd = ""
-        try:
-            if self.remote and  "ssh" in self.command[0]:
-                cmd = f"{self.command[0]}{'; '.join(self.command[1:])};'"
+    def build(self):
+        if self.remote and  "ssh" in self.command[0]:
+            return f"{self.command[0]}{'; '.join(self.command[1:])};'"
+        return f"{'; '.join(self.command)};"
+    
+    def recorded_command(self):
+        """The command as recorded in fixtures: without the ssh prefix, whose options change every run"""
+        commands = self.command[1:] if self.remote and "ssh" in self.command[0] else self.command
+        return "; ".join(commands)
+    
+    def _popen(self, cmd):
+        return subprocess.Popen(
+                [cmd],
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                # Its own session, so the whole process group (ssh, bash -c children) can be stopped
+                start_new_session=True
+            )
+    
+    def span(self, lane=None):
+        """Trace span for running the commands; a remote one on a new session includes the ssh handshake"""
+        return TRACER.span(
+            "ssh" if self.remote else "subprocess",
+            "command",
+            lane,
+            node=self.node or "local",
+            new_session=self.new_session,
+            command=self.recorded_command(),
+        )
+    
+    def observe(self, elapsed):
+        """Adds a finished command to the run metrics"""
+        node = self.host or "local"
+        _COMMANDS.inc(node=node, status="ok" if not self.returncode else "failed")
+        _COMMAND_SECONDS.observe(elapsed, node=node)
+        if self.new_session:
+            _SSH_SETUP_SECONDS.observe(elapsed, node=node)
+    
+    def _communicate(self, cmd):
+        process = self._popen(cmd)
+        stdout, stderr = process.communicate()
+        return {"stdout": stdout, "stderr": stderr, "returncode": process.returncode}
+    
+    def _label(self, default=None):
+        """The node (and mover, inside a mover fan-out) output lines are labelled with"""
+        mover = current_tags().get("mover")
+        node = self.node or default or ("local" if mover else None)
+        if not node:
+            return ""
+        return f"[{node}/{mover}] " if mover else f"[{node}] "
+    
+    def _open_spools(self, spool, capture):
+        """Returns (file, label) pairs; shared spool lines are labelled with the node, capture files are not"""
+        label = self._label("local")
+        return [(open(path, "a"), label) for path in _spool_paths(spool)] + [(open(path, "a"), "") for path in _spool_paths(capture)]
+    
+    def stream(self, spool=None, echo=True, capture=None):
+        """Runs the commands and yields (source, line) tuples as output arrives.
+
+        Both pipes are drained by reader threads into a bounded queue, so the remote
+        command can never stall on a full pipe and memory use does not grow with output size.
+        Closing the generator early terminates the command and its children.
+
+        Args:
+            spool (str or list, optional): File(s) that every line is appended to as it arrives,
+                labelled with the node so several nodes can share one file.
+            echo (bool, optional): Print each line to the console as it arrives. Defaults to True.
+            capture (str or list, optional): File(s) that every line is appended to unlabelled.
+        """
+        if RECORDER.replaying:
+            yield from self._replay_stream(spool, echo, capture)
+            return
+        cmd = self.build()
+        process = self._popen(cmd)
+        lines = queue.Queue(maxsize=_STREAM_QUEUE_SIZE)
+        stopped = threading.Event()
+        recorded = {"stdout": [], "stderr": []} if RECORDER.recording else None
+        start = time.monotonic()
+        
+        def _reader(source, pipe):
+            # Lines longer than the read size arrive in pieces; join them so consumers always get whole lines
+            partial = []
+            for chunk in iter(lambda: pipe.readline(_STREAM_LINE_LIMIT), ""):
+                if not chunk.endswith("\n"):
+                    partial.append(chunk)
+                    continue
+                lines.put((source, "".join(partial) + chunk))
+                partial = []
+                if stopped.is_set():
+                    break
             else:
-                cmd = f"{'; '.join(self.command)};"
-            result = subprocess.Popen(
-                    [cmd],
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True
-                )
-            result.wait()
-            stdout = result.stdout.read()
-            stderr = result.stderr.read()
+                if partial:
+                    lines.put((source, "".join(partial)))
+            pipe.close()
+            lines.put((source, None))
+        
+        readers = [
+            threading.Thread(target=_reader, args=("stdout", process.stdout), daemon=True),
+            threading.Thread(target=_reader, args=("stderr", process.stderr), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        prefix = self._label()
+        spool_files = self._open_spools(spool, capture)
+        open_pipes = len(readers)
+        try:
+            while open_pipes:
+                source, line = lines.get()
+                if line is None:
+                    open_pipes -= 1
+                    continue
+                if echo:
+                    print(f"{prefix}{line}", end="")
+                for spool_file, label in spool_files:
+                    spool_file.write(f"{label}{line}" if source == "stdout" else f"{label}[stderr] {line}")
+                if recorded:
+                    recorded[source].append(line)
+                yield source, line
+        finally:
+            for spool_file, _ in spool_files:
+                spool_file.close()
+            if open_pipes:
+                # Closed early: stop the command, and free queue space so readers blocked on a
+                # full queue can see the stop flag and exit instead of holding the pipes open
+                stopped.set()
+                try:
+                    os.killpg(process.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+                while True:
+                    try:
+                        lines.get_nowait()
+                    except queue.Empty:
+                        break
+            process.wait()
+            self.returncode = process.returncode
+            if recorded:
+                response = {"stdout": "".join(recorded["stdout"]), "stderr": "".join(recorded["stderr"]), "returncode": self.returncode}
+                RECORDER.record("runner", self.recorded_command(), response, time.monotonic() - start, self.node)
+    
+    def _replay_stream(self, spool=None, echo=True, capture=None):
+        response = RECORDER.replay("runner", self.recorded_command(), self.node)
+        prefix = self._label()
+        spool_files = self._open_spools(spool, capture)
+        try:
+            for source in ["stdout", "stderr"]:
+                for line in (response[source] or "").splitlines(keepends=True):
+                    if echo:
+                        print(f"{prefix}{line}", end="")
+                    for spool_file, label in spool_files:
+                        spool_file.write(f"{label}{line}" if source == "stdout" else f"{label}[stderr] {line}")
+                    yield source, line
+        finally:
+            for spool_file, _ in spool_files:
+                spool_file.close()
+        self.returncode = response["returncode"]
+    
+    def run(self, stream=False, spool=None, tail=_STREAM_TAIL_LINES, capture=None, require_output=True, echo=True):
+        """Runs the commands and returns (description, stdout, stderr).
+
+        Args:
+            stream (bool, optional): Echo output live instead of waiting for the command to finish.
+            spool (str or list, optional): File(s) that streamed output is appended to, labelled with the node.
+            tail (int, optional): In stream mode, only the last `tail` lines of each pipe are returned.
+            capture (str or list, optional): File(s) that streamed output is appended to unlabelled.
+            require_output (bool, optional): Raise ExecutionError when the commands print nothing. Defaults to True.
+            echo (bool, optional): In stream mode, print output live. Defaults to True.
+        """
+        cmd = self.build()
+        start = time.monotonic()
+        try:
+            with self.span():
+                if stream:
+                    captured = {"stdout": deque(maxlen=tail), "stderr": deque(maxlen=tail)}
+                    for source, line in self.stream(spool=spool, echo=echo, capture=capture):
+                        captured[source].append(line)
+                    stdout, stderr = "".join(captured["stdout"]), "".join(captured["stderr"])
+                else:
+                    response = RECORDER.intercept("runner", self.recorded_command(), lambda: self._communicate(cmd), self.node)
+                    stdout, stderr, self.returncode = response["stdout"], response["stderr"], response["returncode"]
+            self.observe(time.monotonic() - start)
             
-            if not stdout and not stderr:
+            if require_output and not stdout and not stderr:
                 raise ExecutionError(cmd)
             
             return f"Ran: {cmd}", stdout, stderr
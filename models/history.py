@@ -0,0 +1,219 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import HISTORY_FILE as _HISTORY_FILE
+from models.globals import printv
+
+# Commands can report metrics by printing lines like: SDS_METRIC write_mb_s=412.5
+_METRIC_PATTERN = re.compile(r"^SDS_METRIC\s+([A-Za-z_][\w.]*)=([-+\d.eE]+)\s*$", re.MULTILINE)
+
+
+def parse_metrics(output: Optional[str]) -> Dict[str, float]:
+    return {name: float(value) for name, value in _METRIC_PATTERN.findall(output or "")}
+
+
+def higher_is_better(metric: str) -> bool:
+    return "throughput" in metric or metric.endswith("_mb_s") or metric.endswith("_per_s")
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    # Continued fraction for the incomplete beta function (Numerical Recipes, betacf)
+    def nonzero(value: float) -> float:
+        return value if abs(value) > 1e-30 else 1e-30
+
+    qab, qap, qam = a + b, a + 1, a - 1
+    c, d = 1.0, 1 / nonzero(1 - qab * x / qap)
+    h = d
+    for m in range(1, 201):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1 / nonzero(1 + aa * d)
+        c = nonzero(1 + aa / c)
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1 / nonzero(1 + aa * d)
+        c = nonzero(1 + aa / c)
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 3e-12:
+            break
+    return h
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    if x <= 0 or x >= 1:
+        return max(0.0, min(1.0, x))
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1 - front * _betacf(b, a, 1 - x) / b
+
+
+def _step_key(step: Dict[str, Any], index: int) -> str:
+    # Named workflow steps are matched by name, plain command runs by position
+    return f"step:{step['step']}_wall_s" if step.get("step") else f"step{index}_wall_s"
+
+
+def _cmd_key(steps: List[Dict[str, Any]]) -> str:
+    # --cmd runs have no workflow name; the same command text is the same series
+    text = "\n".join(step["command"] for step in steps)
+    return f"cmd:{hashlib.sha1(text.encode()).hexdigest()[:12]}"
+
+
+def _matches_workflow(record: Dict[str, Any], workflow: str) -> bool:
+    # "cmd" selects every --cmd series
+    return record.get("workflow") == workflow or (workflow == "cmd" and str(record.get("workflow")).startswith("cmd:"))
+
+
+def _step_walls(record: Dict[str, Any]) -> Dict[str, float]:
+    return {_step_key(step, index): step.get("wall_s") for index, step in enumerate(record.get("steps") or [])}
+
+
+def welch_t_test(baseline: List[float], recent: List[float]) -> Tuple[float, float]:
+    """Two-sided Welch's t-test, returns (t, p). Needs at least two samples on each side."""
+    n1, n2 = len(baseline), len(recent)
+    m1, m2 = sum(baseline) / n1, sum(recent) / n2
+    v1 = sum((x - m1) ** 2 for x in baseline) / (n1 - 1)
+    v2 = sum((x - m2) ** 2 for x in recent) / (n2 - 1)
+    se = v1 / n1 + v2 / n2
+    if se == 0:
+        return (0.0, 1.0) if m1 == m2 else (math.copysign(math.inf, m2 - m1), 0.0)
+    t = (m2 - m1) / math.sqrt(se)
+    df = se ** 2 / ((v1 / n1) ** 2 / (n1 - 1) + (v2 / n2) ** 2 / (n2 - 1))
+    return t, _incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+class History:
+    """Append-only JSONL log of every workflow/command run"""
+
+    def __init__(self, path: str = _HISTORY_FILE) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+        printv(f"Recorded run in {self.path}")
+
+    def record(self, operator: Any, workflow: Optional[str], elapsed: float, error: Optional[str] = None) -> Dict[str, Any]:
+        """Builds a run record from an Operator's steps and appends it"""
+        metrics: Dict[str, float] = {}
+        for step in operator.steps:
+            metrics.update(step.get("metrics", {}))
+        exit_codes = [step["exit_code"] for step in operator.steps if step["exit_code"] is not None]
+        record = {
+            "timestamp": time.time(),
+            "node": operator.config.node if operator.config else None,
+            "service": operator.config.service if operator.config else None,
+            "device": operator.config.device if operator.config else None,
+            "mover": operator.config.mover if operator.config else None,
+            "workflow": workflow or _cmd_key(operator.steps),
+            "wall_s": elapsed,
+            "exit_code": max(exit_codes, default=0),
+            "error": error,
+            "steps": operator.steps,
+            "metrics": metrics,
+        }
+        self.append(record)
+        return record
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def compare(
+        self,
+        workflow: Optional[str] = None,
+        node: Optional[str] = None,
+        baseline: int = 20,
+        recent: int = 5,
+        alpha: float = 0.05,
+        threshold: float = 0.05,
+    ) -> List[Dict[str, Any]]:
+        """Compares the latest runs of each (node, mover, workflow) against the runs before them.
+
+        Each series compares its last `recent` successful runs with the `baseline` runs before
+        those. It covers wall time, per-step wall time and every reported metric. A series is
+        flagged when Welch's t-test gives p < alpha and the mean moved the wrong way by more
+        than `threshold` (a fraction).
+        """
+        groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for record in self.records():
+            if record.get("exit_code") or record.get("error"):
+                continue
+            if (workflow and not _matches_workflow(record, workflow)) or (node and record.get("node") != node):
+                continue
+            groups.setdefault((record.get("node"), record.get("mover"), record.get("workflow")), []).append(record)
+
+        findings = []
+        for (group_node, mover, group_workflow), runs in groups.items():
+            runs.sort(key=lambda record: record["timestamp"])
+            latest, before = runs[-recent:], runs[-recent - baseline:-recent]
+            if len(latest) < 2 or len(before) < 2:
+                continue
+            series: Dict[str, Tuple[List[float], List[float]]] = {}
+
+            def collect(name: str, pick: Any) -> None:
+                old = [value for value in map(pick, before) if value is not None]
+                new = [value for value in map(pick, latest) if value is not None]
+                if len(old) >= 2 and len(new) >= 2:
+                    series[name] = (old, new)
+
+            collect("wall_s", lambda record: record.get("wall_s"))
+            for key in _step_walls(latest[-1]):
+                collect(key, lambda record, k=key: _step_walls(record).get(k))
+            for metric in latest[-1].get("metrics", {}):
+                collect(metric, lambda record, m=metric: record.get("metrics", {}).get(m))
+
+            for name, (old, new) in series.items():
+                old_mean, new_mean = sum(old) / len(old), sum(new) / len(new)
+                change = (new_mean - old_mean) / old_mean if old_mean else 0.0
+                worse = -change if higher_is_better(name) else change
+                t, p = welch_t_test(old, new)
+                findings.append({
+                    "node": group_node,
+                    "mover": mover,
+                    "workflow": group_workflow,
+                    "metric": name,
+                    "baseline_mean": old_mean,
+                    "recent_mean": new_mean,
+                    "change": change,
+                    "p_value": p,
+                    "regression": p < alpha and worse > threshold,
+                })
+        return findings
+
+    @staticmethod
+    def print_comparison(findings: List[Dict[str, Any]]) -> None:
+        if not findings:
+            print("Not enough history to compare (need at least 2 baseline and 2 recent successful runs).")
+            return
+        print("\n****************************************************************************************************")
+        print(f"    {'node':<20} {'mover':<10} {'workflow':<20} {'metric':<16} {'baseline':>10} {'recent':>10} {'change':>8} {'p':>7}")
+        print("****************************************************************************************************")
+        for finding in findings:
+            flag = "REGRESSION" if finding["regression"] else ""
+            print(
+                f"    {str(finding['node']):<20} {str(finding['mover']):<10} {str(finding['workflow']):<20} {finding['metric']:<16} "
+                f"{finding['baseline_mean']:>10.3f} {finding['recent_mean']:>10.3f} {finding['change']:>+8.1%} {finding['p_value']:>7.3f}  {flag}"
+            )
+        print("****************************************************************************************************\n")
+
+
+HISTORY = History()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from config import CACHE_DIR as _CACHE_DIR
+from config import SERVER_SPECS as _SERVER_SPECS
+from models.globals import printv
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS nodes (
+    name TEXT PRIMARY KEY,
+    service TEXT COLLATE NOCASE,
+    device_type TEXT COLLATE NOCASE,
+    mover_type TEXT COLLATE NOCASE,
+    spec TEXT
+);
+CREATE TABLE IF NOT EXISTS node_groups (
+    node TEXT,
+    name TEXT COLLATE NOCASE,
+    PRIMARY KEY (name, node)
+);
+CREATE INDEX IF NOT EXISTS nodes_by_role ON nodes (service, device_type, mover_type);
+CREATE INDEX IF NOT EXISTS nodes_by_mover ON nodes (mover_type);
+CREATE INDEX IF NOT EXISTS nodes_by_device ON nodes (device_type);
+"""
+
+# --select keys and the column each one filters on
+SELECTORS = {
+    "service": "nodes.service",
+    "device": "nodes.device_type",
+    "mover": "nodes.mover_type",
+    "group": "node_groups.name",
+}
+
+
+class Inventory:
+    """SQLite index of server_specs.json.
+
+    The JSON file stays the source of truth; the index is rebuilt whenever its
+    mtime or size changes, so lookups and fleet selections are indexed queries
+    instead of a full parse of the file per node.
+    """
+
+    def __init__(self, specs_path: str = _SERVER_SPECS, db_path: Optional[str] = None) -> None:
+        self.specs_path = specs_path
+        if not db_path:
+            digest = hashlib.sha1(os.path.abspath(specs_path).encode()).hexdigest()[:16]
+            db_path = os.path.join(_CACHE_DIR, f"inventory-{digest}.sqlite3")
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _source_version(self) -> str:
+        if not os.path.exists(self.specs_path):
+            return "missing"
+        stat = os.stat(self.specs_path)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def sync(self) -> sqlite3.Connection:
+        """Rebuilds the index if server_specs.json changed since it was built"""
+        db = self._connect()
+        version = self._source_version()
+        row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row and row[0] == version:
+            return db
+        printv(f"Indexing inventory: {self.specs_path}")
+        specs: Dict[str, Any] = {}
+        if version != "missing":
+            with open(self.specs_path, "r") as cfg_file:
+                specs = json.loads(cfg_file.read()) or {}
+        with db:
+            db.execute("DELETE FROM nodes")
+            db.execute("DELETE FROM node_groups")
+            db.executemany(
+                "INSERT INTO nodes VALUES (?, ?, ?, ?, ?)",
+                [
+                    (name, spec.get("service"), spec.get("device_type"), spec.get("mover_type"), json.dumps(spec))
+                    for name, spec in specs.items()
+                ],
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO node_groups VALUES (?, ?)",
+                [(name, group) for name, spec in specs.items() for group in spec.get("groups", [])],
+            )
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        return db
+
+    def get(self, node: str) -> Optional[Dict[str, Any]]:
+        """Returns the server_specs.json entry for node, or None if it isn't listed"""
+        with self._lock:
+            row = self.sync().execute("SELECT spec FROM nodes WHERE name = ?", (node,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def select(self, **selectors: Optional[str]) -> List[str]:
+        """Returns the nodes matching every given selector (service, device, mover, group).
+
+        Values are matched case-insensitively, e.g. select(service="cta", device="tape", mover="ibm").
+        """
+        unknown = set(selectors) - set(SELECTORS)
+        if unknown:
+            raise KeyError(f"Unknown selector(s): {', '.join(sorted(unknown))}")
+        clauses, values = [], []
+        for key, value in selectors.items():
+            if value is not None:
+                clauses.append(f"{SELECTORS[key]} = ?")
+                values.append(value)
+        query = "SELECT DISTINCT nodes.name FROM nodes"
+        if selectors.get("group") is not None:
+            query += " JOIN node_groups ON node_groups.node = nodes.name"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            return [row[0] for row in self.sync().execute(query + " ORDER BY nodes.rowid", values)]
+
+
+INVENTORY = Inventory()
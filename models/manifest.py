@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+from models.cache import TTLCache
+from models.globals import printv
+from models.helpers import WorkflowParser
+from models.workflow import Workflow
+
+# Bump when the compiled layout changes so stale manifests are rebuilt
+_MANIFEST_VERSION = 3
+_manifests = TTLCache("manifests", ttl=float("inf"))
+
+
+def _trigrams(text: str) -> List[str]:
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+class WorkflowManifest(Mapping):
+    """Precompiled catalog of a service's workflows.json.
+
+    Holds validated definitions, their preformatted --list descriptions and a trigram
+    index for --filter. The compiled form is cached on disk and only rebuilt when the
+    source file's mtime and content hash change. Workflow objects are created on lookup.
+    """
+
+    def __init__(self, service: str, compiled: Optional[Dict[str, Any]] = None) -> None:
+        compiled = compiled or {}
+        self.service = service
+        self.definitions: Dict[str, Dict[str, Any]] = compiled.get("definitions", {})
+        self.descriptions: Dict[str, str] = compiled.get("descriptions", {})
+        self.index: Dict[str, List[str]] = compiled.get("index", {})
+        self._workflows: Dict[str, Workflow] = {}
+
+    def __getitem__(self, name: str) -> Workflow:
+        if name not in self._workflows:
+            self._workflows[name] = Workflow(self.definitions[name], name)
+        return self._workflows[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.definitions)
+
+    def __len__(self) -> int:
+        return len(self.definitions)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.definitions
+
+    def search(self, text: Optional[str] = None) -> List[str]:
+        """Returns workflow names containing text (case-insensitive), in catalog order"""
+        if not text:
+            return list(self.definitions)
+        text = text.lower()
+        if len(text) < 3:
+            candidates = set(self.definitions)
+        else:
+            candidates = None
+            for trigram in _trigrams(text):
+                matches = set(self.index.get(trigram, []))
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return []
+        return [name for name in self.definitions if name in candidates and text in name.lower()]
+
+    @staticmethod
+    def validate(name: str, definition: Any) -> List[str]:
+        """Returns the problems with a workflow definition, empty if it is usable"""
+        if not isinstance(definition, dict):
+            return ["definition is not an object"]
+        problems = []
+        for field in ["title", "description"]:
+            if not isinstance(definition.get(field), str) or not definition.get(field):
+                problems.append(f"'{field}' must be a non-empty string")
+        steps = definition.get("steps")
+        if steps is None:
+            if not isinstance(definition.get("commands"), list) or not all(isinstance(c, str) for c in definition["commands"]):
+                problems.append("'commands' must be a list of strings")
+        elif not isinstance(steps, dict) or not steps:
+            problems.append("'steps' must be a non-empty object of named steps")
+        else:
+            for step_name, step in steps.items():
+                if not isinstance(step, dict):
+                    problems.append(f"step '{step_name}' is not an object")
+                    continue
+                commands = step.get("commands")
+                if not isinstance(commands, list) or not all(isinstance(c, str) for c in commands):
+                    problems.append(f"step '{step_name}' needs a 'commands' list of strings")
+                needs = step.get("needs", [])
+                if not isinstance(needs, list) or not all(isinstance(need, str) for need in needs):
+                    problems.append(f"step '{step_name}': 'needs' must be a list of step names")
+                else:
+                    unknown = [need for need in needs if need not in steps]
+                    if unknown:
+                        problems.append(f"step '{step_name}' needs unknown step(s): {', '.join(unknown)}")
+                if "node" in step and not isinstance(step["node"], str):
+                    problems.append(f"step '{step_name}': 'node' must be a string")
+        if not isinstance(definition.get("requirements", {}), dict):
+            problems.append("'requirements' must be an object")
+        params = definition.get("params", [])
+        if not isinstance(params, list):
+            problems.append("'params' must be a list")
+        else:
+            for param in params:
+                if not isinstance(param, dict) or not all(param.get(key) for key in ["name", "description", "type"]):
+                    problems.append(f"param {param} needs 'name', 'description' and 'type'")
+        return problems
+
+    @staticmethod
+    def compile(service: str, workflows: Dict[str, Any]) -> Dict[str, Any]:
+        definitions, descriptions, index = {}, {}, {}
+        for name, definition in workflows.items():
+            problems = WorkflowManifest.validate(name, definition)
+            if problems:
+                print(f"Skipping invalid {service} workflow '{name}': {'; '.join(problems)}")
+                continue
+            definition.setdefault("requirements", {})
+            definition.setdefault("params", [])
+            definitions[name] = definition
+            descriptions[name] = WorkflowParser.parse_description(
+                definition["title"], "GET", definition["description"]
+            )
+            for trigram in set(_trigrams(name.lower())):
+                index.setdefault(trigram, []).append(name)
+        return {"definitions": definitions, "descriptions": descriptions, "index": index}
+
+    @staticmethod
+    def load(service: str, path: Optional[str] = None) -> "WorkflowManifest":
+        """Returns the manifest for tests/{service}/scripts/workflows.json, compiling it only when it changed"""
+        path = path or f"tests/{service}/scripts/workflows.json"
+        if not os.path.exists(path):
+            printv(f"No workflows found for {service} at {path}")
+            return WorkflowManifest(service)
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = _manifests.get(key)
+        if cached and cached.get("version") == _MANIFEST_VERSION:
+            if cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+                printv(f"Using compiled workflow manifest for {service}")
+                return WorkflowManifest(service, cached["compiled"])
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if cached and cached.get("version") == _MANIFEST_VERSION and cached.get("sha1") == digest:
+            # Touched but unchanged: keep the compiled manifest, just record the new mtime
+            compiled = cached["compiled"]
+        else:
+            printv(f"Compiling workflow manifest for {service}")
+            compiled = WorkflowManifest.compile(service, json.loads(raw))
+        _manifests.set(key, {
+            "version": _MANIFEST_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha1": digest,
+            "compiled": compiled,
+        })
+        return WorkflowManifest(service, compiled)
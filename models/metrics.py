@@ -0,0 +1,208 @@
+import atexit
+import math
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import METRICS_FILE as _METRICS_FILE
+from models.globals import printv
+
+# Tape operations run from milliseconds (a local lsscsi) to many minutes (a full volume write)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, math.inf)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A metric family: one value (or histogram) per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self, openmetrics: bool) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(self.values.items())
+            ]
+
+    def render(self, openmetrics: bool = True) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ] + self.samples(openmetrics)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self, openmetrics: bool) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}_total{_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(self.values.items())
+            ]
+
+    def render(self, openmetrics: bool = True) -> List[str]:
+        # The Prometheus text format node_exporter reads names the family after its sample
+        name = self.name if openmetrics else f"{self.name}_total"
+        return [f"# HELP {name} {self.documentation}", f"# TYPE {name} counter"] + self.samples(openmetrics)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(set(buckets) | {math.inf}))
+        self.series: Dict[Tuple[str, ...], Dict[str, object]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self.series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self, openmetrics: bool) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, key, ('le', _format_value(bound)))} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metric families, rendered as OpenMetrics or Prometheus text.
+
+    Metrics are created on first use, so call sites just ask for them by name.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+        self.textfile: Optional[str] = None
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, documentation: str, labels: Sequence[str], **kwargs) -> Metric:
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, documentation, labels, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self, openmetrics: bool = True) -> str:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = [line for metric in sorted(metrics, key=lambda m: m.name) for line in metric.render(openmetrics)]
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Optional[str] = None) -> None:
+        """Atomically writes the metrics for node_exporter's textfile collector (path should end in .prom)"""
+        path = path or self.textfile
+        if not path:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render(openmetrics=False))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        printv(f"Wrote metrics to {path}")
+
+    def export_on_exit(self, path: str) -> None:
+        if not self.textfile:
+            atexit.register(self.write_textfile)
+        self.textfile = path
+
+    def serve(self, port: int, address: str = "127.0.0.1") -> None:
+        """Serves /metrics on a background thread for as long as the process runs.
+
+        Values from a run that ends between two scrapes are never collected; write_textfile
+        is the way to export them from short-lived runs.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = registry.render(openmetrics).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:
+                printv(f"Metrics request: {format % args}")
+
+        self._server = ThreadingHTTPServer((address, port), _Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        printv(f"Serving metrics on http://{address}:{self._server.server_port}/metrics")
+
+
+METRICS = MetricsRegistry()
+if _METRICS_FILE:
+    METRICS.export_on_exit(_METRICS_FILE)
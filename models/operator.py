@@ -1,15 +1,31 @@
 import argparse
+import copy
 import json
 import os
 import subprocess
 import sys
-from unittest import runner
-from urllib import response
+import threading
+import time
 from models.globals import printv, SUPPORTED_WORKFLOWS
+from config import DETECTION_TTL as _DETECTION_TTL
+from models.cache import TTLCache
 from models.errors import ConfigurationError, ServiceNotInstalledError
 from models.helpers import Runner, WorkflowParser
+from models.history import HISTORY, parse_metrics
+from models.metrics import METRICS
+from models.output import current_tags
+from models.results import RESULTS
+from models.tracing import TRACER
 from models.settings import Configuration
 
+# Serializes interactive prompts when several nodes are handled at once
+_prompt_lock = threading.Lock()
+_detections = TTLCache("detection", _DETECTION_TTL)
+# Bump when what detection collects changes, so cached detections are probed again
+_DETECTION_VERSION = 2
+_DETECTION_SECONDS = METRICS.histogram(
+    "sds_service_detection_seconds", "Wall time of remote service and mover detection.", ["node", "cached"]
+)
 
 class Operator:
     global SUPPORTED_WORKFLOWS
@@ -22,6 +38,22 @@ class Operator:
         self.service_workflows = f"tests/$SERVICE/scripts/functions.json"
         self.quiet = args.quiet
         self.verbose = args.verbose
+        self.stream = getattr(args, "stream", False)
+        self.spool = getattr(args, "spool", None)
+        self.results = []
+        self.steps = []
+        self.defer_output = False
+        self.rediscover = getattr(args, "rediscover", False)
+        self.mover_policy = getattr(args, "mover_policy", None) or ("prompt" if sys.stdin.isatty() else "first")
+        self.jobs = getattr(args, "jobs", 8)
+        self.movers = {}
+        # Set on the per-mover copies run_on_movers makes, and on the operator that fanned out to them
+        self.slot = None
+        self.mover_results = {}
+        self.error = None
+        # (results, elapsed) of the last step workflow run, for StepScheduler.print_summary
+        self.step_summary = None
+        self.workflow = getattr(args, "run", None)
         if bool(args.node and args.suite and extra_args and extra_args.device and extra_args.mover):
             self.config = Configuration(args.node, args.suite, extra_args.device, extra_args.mover)
         elif args.node and (not extra_args or extra_args and not  (args.suite  or extra_args.device or extra_args.mover)):
@@ -36,10 +68,22 @@ class Operator:
         self.valid = self.config.is_valid()
         self.remote = self.config.is_remote()
     
+    def print_results(self):
+        """Prints the collected results, each mover's under its own heading"""
+        for result in self.mover_results.values():
+            if result.operator:
+                result.operator.print_results()
+        for _, stdout, stderr in self.results:
+            self._print_results(stdout, stderr)
+        if self.step_summary:
+            from models.scheduler import StepScheduler
+            StepScheduler.print_summary(*self.step_summary)
+    
     def _print_results(self, stdout, stderr):
+        source = f"{self.config.node} ({self.config.mover} {self.slot})" if self.slot else self.config.node
         if sys.version_info > (3, 6, 8):
             if stdout:
-                print(f"    Response from {self.config.node}:\n".upper(), f"\n***************************************************\n\n", stdout, "\n***************************************************")
+                print(f"    Response from {source}:\n".upper(), f"\n***************************************************\n\n", stdout, "\n***************************************************")
             if stderr:
                 printv(stderr)
         else:
@@ -94,17 +138,122 @@ class Operator:
             raise NotImplementedError(f"{test_name} not implemented")
     
         
-    def run_command(self, cmd, test=False):
+    def run_command(self, cmd, test=False, require_output=True):
         if isinstance(cmd, str):
             cmd = cmd.replace("[", "").replace("]", "").split(",")
         runner = Runner(self.config, self.user)
         runner.add_commands(cmd)
-        cmd, stdout, stderr = runner.run()
+        stream = self.stream and not test
+        result_path = RESULTS.reserve(self.config.node, current_tags().get("step")) if RESULTS.enabled and not test else None
+        start = time.monotonic()
+        # Saved output goes to the store as it arrives, streamed or not, so only its tail is kept in memory
+        cmd, stdout, stderr = runner.run(
+            stream=stream or bool(result_path),
+            spool=self.spool if stream else None,
+            capture=result_path,
+            require_output=require_output,
+            echo=stream,
+        )
+        if not test:
+            self._record_step(runner.recorded_command(), time.monotonic() - start, runner.returncode, stdout)
+        if result_path:
+            RESULTS.commit(
+                result_path,
+                node=self.config.node,
+                workflow=self.workflow or "cmd",
+                step=current_tags().get("step"),
+                mover=self.config.mover,
+                command=runner.recorded_command(),
+                exit_code=runner.returncode,
+            )
         if stdout or stderr:
             printv(cmd)
             if test:
                 return stdout, stderr
-            self._print_results(stdout, stderr)
+            self.results.append((cmd, stdout, stderr))
+            if not self.defer_output and not stream:
+                self._print_results(stdout, stderr)
+
+    def _record_step(self, cmd, elapsed, exit_code, stdout):
+        self.steps.append({
+            "command": cmd,
+            "wall_s": elapsed,
+            "exit_code": exit_code,
+            "metrics": parse_metrics(stdout),
+        })
+
+    async def arun_command(self, cmd, test=False, timeout=None, semaphore=None):
+        """Awaitable run_command; many of these can be gathered to run at once"""
+        # asyncio is only loaded by callers that use the async API
+        from models.async_runner import AsyncRunner
+        if isinstance(cmd, str):
+            cmd = cmd.replace("[", "").replace("]", "").split(",")
+        runner = AsyncRunner(self.config, self.user, semaphore=semaphore)
+        runner.add_commands(cmd)
+        start = time.monotonic()
+        cmd, stdout, stderr = await runner.run(timeout)
+        if not test:
+            self._record_step(runner.recorded_command(), time.monotonic() - start, runner.returncode, stdout)
+        if stdout is None and stderr is None:
+            # Timed out: cmd describes it, and the run fails
+            self.error = cmd
+            if not self.defer_output:
+                print(cmd)
+            return
+        if stdout or stderr:
+            printv(cmd)
+            if test:
+                return stdout, stderr
+            self.results.append((cmd, stdout, stderr))
+            if not self.defer_output:
+                self._print_results(stdout, stderr)
+
+    def for_node(self, node=None):
+        """Returns an operator for a workflow step: this one's settings, pointed at node if given"""
+        ops = copy.copy(self)
+        ops.results = []
+        ops.steps = []
+        ops.step_summary = None
+        if node and node != self.config.node:
+            ops.config = Configuration.from_json(node)
+            if not ops.config.service:
+                ops.config.service = self.config.service
+            ops.remote = ops.config.is_remote()
+        return ops
+
+    def tape_movers(self):
+        """The detected movers that run_on_movers fans out to: tape drives, never changers or disks"""
+        return {mover["slot"]: mover for mover in self.movers.values() if mover["device_type"] == "tape"}
+
+    def run_on_movers(self, workflow, *args):
+        """Runs a workflow against every detected tape drive at once.
+
+        Each mover gets its own copy of this operator, configured for that device, and the
+        workflow's $device_type/$mover_type/$slot placeholders are filled from the mover.
+
+        Returns:
+            dict: executor.NodeResult objects keyed by mover slot.
+        """
+        from models.executor import FanOut
+        movers = self.tape_movers()
+        
+        def task(slot):
+            ops = copy.copy(self)
+            ops.config = copy.copy(self.config)
+            ops.config.device = movers[slot]["device_type"]
+            ops.config.mover = movers[slot]["mover_type"]
+            ops.slot = slot
+            ops.mover_results = {}
+            ops.results = []
+            ops.steps = []
+            ops.step_summary = None
+            ops.defer_output = True
+            start = time.monotonic()
+            workflow.run(ops, *args, mover=movers[slot])
+            HISTORY.record(ops, workflow.key, time.monotonic() - start)
+            return ops
+        
+        return FanOut(list(movers), self.jobs, label="mover").run(task)
 
     def detect_service(self, args):
         printv(f"Searching for installed services on {args.node}")
@@ -123,8 +272,57 @@ class Operator:
             raise ServiceNotInstalledError(args.node)
         
     
+    def _detect(self, args):
+        """Returns the remote node's detected service and movers, probing only on a cache miss.
+
+        Results are cached per user@node for DETECTION_TTL seconds; --rediscover forces a fresh probe.
+        """
+        key = f"{self.user}@{self.config.node}"
+        start = time.monotonic()
+        detected = None if self.rediscover else _detections.get(key)
+        if detected is not None and detected.get("version") != _DETECTION_VERSION:
+            detected = None
+        cached = detected is not None
+        if detected is None:
+            detected = self._probe_remote_service(args)
+            if detected is None:
+                return None
+            detected["version"] = _DETECTION_VERSION
+            if detected["service"]:
+                _detections.set(key, detected)
+        else:
+            printv(f"Using cached detection for {key}")
+        _DETECTION_SECONDS.observe(time.monotonic() - start, node=self.config.node, cached=str(cached).lower())
+        return detected
+    
+    @TRACER.traced("Operator.detect_remote_service")
     def detect_remote_service(self, args):
-        """Goes to the remote node and checks for the service"""
+        """Goes to the remote node and checks for the service and its movers"""
+        detected = self._detect(args)
+        if detected is None:
+            return
+        
+        self.config.service = detected["service"]
+        movers = {int(i): mover for i, mover in detected["movers"].items()}
+        self.movers = movers
+        selected = self._select_remote_mover(movers, detected.get("selected"))
+        if selected:
+            self.config.device = selected["device_type"]
+            self.config.mover = selected["mover_type"]
+            if self.mover_policy == "prompt" and detected.get("selected") != selected:
+                # Remember the answer so the next run against this node doesn't ask again
+                detected["selected"] = selected
+                _detections.set(f"{self.user}@{self.config.node}", detected)
+        self.valid = self.config.is_valid()
+        self.remote = self.config.is_remote()
+    
+    def detect_movers(self, args):
+        """Fills in the movers of a node whose configuration came from server_specs.json, keeping that configuration"""
+        detected = self._detect(args) if self.remote else None
+        if detected:
+            self.movers = {int(i): mover for i, mover in detected["movers"].items()}
+    
+    def _probe_remote_service(self, args):
         runner = Runner(self.config, self.user)
         if runner.node:
             for service, path in {"CTA": "/etc/cta", "Enstore": "/opt/enstore", "Enstore": "/home/enstore"}.items():
@@ -133,50 +331,56 @@ class Operator:
             cmd, stdout, stderr = runner.run()
             if stdout or stderr:
                 lines = stdout.split("\n")
+                service = None
                 movers = {}
                 i = 0
                 for line in lines:
                     if line.strip() and line in ["CTA", "Enstore"]:
                         printv(f"Service detected: {line.lower()}")
-                        self.config.service = line.lower()
-                    elif self.config.service and line.strip():
+                        service = line.lower()
+                    elif service and line.strip():
                         info = line.split()
-                        if self.config.service == "cta":
-                            if len(info) > 2 and info[1] in ["disk", "mediumx"]:
+                        if service == "cta":
+                            if len(info) > 2 and info[1] in ["disk", "mediumx", "tape"]:
                                 printv(f"Mover detected: {line[2:-1]}")
                                 movers[i] = {"device_type": info[1], "mover_type": info[2], "slot": info[-1]}
-                        elif self.config.service == "enstore":
+                        elif service == "enstore":
                             if len(info) > 2 and info[1] in ["disk", "tape"]:
                                 printv(f"Mover detected: {line[2:-1]}")
                                 movers[i] = {"device_type": info[1], "mover_type": info[2], "slot": info[-1]}
                         else:
                             continue
                         i += 1
-                        
-                selected = self._select_remote_mover(movers)
-                if selected:
-                    self.config.device = selected["device_type"]
-                    self.config.mover = selected["mover_type"]
-                self.valid = self.config.is_valid()
-                self.remote = self.config.is_remote()
+                return {"service": service or self.config.service, "movers": movers}
             else:
                 raise ServiceNotInstalledError(args.node)
                 
     
-    def _select_remote_mover(self, movers):
-        prompt = ["Available movers: "]
-        if not movers:
+    def _select_remote_mover(self, movers, previous=None):
+        """Picks a mover according to --mover-policy.
+
+        prompt: ask (reusing a previously cached answer if it is still present), first: take
+        the first detected mover, none: leave device and mover unset, all: configure the first
+        tape drive, and let run_on_movers exercise every one.
+        """
+        if not movers or self.mover_policy == "none":
             return None
+        if self.mover_policy == "all":
+            tapes = [movers[i] for i in sorted(movers) if movers[i]["device_type"] == "tape"]
+            if tapes:
+                return tapes[0]
+        if self.mover_policy in ["first", "all"]:
+            return movers[min(movers)]
+        if previous in movers.values():
+            printv(f"Using previously selected mover: {previous}")
+            return previous
+        prompt = [f"Available movers on {self.config.node}: "]
         for key, val in movers.items():
             prompt.append(f"    {key}: {val}")
-        while True:
-            response = input("\n".join(prompt) + "\nSelected Mover: ")
-            if response and response.isnumeric() and int(response) in movers:
-                return movers[int(response)]
-            else:
-                print("Invalid selection, please try again.")
-        
-
-    
-
-    
\ No newline at end of file
+        with _prompt_lock:
+            while True:
+                response = input("\n".join(prompt) + "\nSelected Mover: ")
+                if response and response.isnumeric() and int(response) in movers:
+                    return movers[int(response)]
+                else:
+                    print("Invalid selection, please try again.")
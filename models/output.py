@@ -0,0 +1,211 @@
+import atexit
+import contextlib
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# A source's buffered lines are written as one block once it has this many, or once
+# its oldest line has waited _FLUSH_INTERVAL seconds
+_BUFFER_LINES = 64
+_FLUSH_INTERVAL = 0.05
+_TAG_NAMES = ("node", "mover", "step")
+
+_tags = threading.local()
+
+
+def current_tags() -> Dict[str, str]:
+    return getattr(_tags, "value", {})
+
+
+@contextlib.contextmanager
+def tagged(parent: Optional[Dict[str, str]] = None, **tags: Any) -> Iterator[None]:
+    """Tags everything this thread prints inside the block, e.g. tagged(node="host", step="write").
+
+    Worker threads start untagged; pass the submitting thread's current_tags() as parent to keep them.
+    """
+    previous = current_tags()
+    _tags.value = {**previous, **(parent or {}), **{key: str(value) for key, value in tags.items() if value is not None}}
+    try:
+        yield
+    finally:
+        _tags.value = previous
+
+
+class OutputPipeline:
+    """Console output written by a background thread.
+
+    Callers only queue records; the writer thread formats them and groups lines by source
+    (the node/step tags of the thread that printed them), so concurrent nodes come out in
+    blocks instead of interleaved lines. Records a quiet or non-verbose run would not show
+    are dropped before they are queued or formatted. In "json" mode every line is written
+    as a JSON object with its level and tags.
+    """
+
+    def __init__(self, stream=None, mode: str = "text") -> None:
+        self.stream = stream
+        self.mode = mode
+        self.quiet = False
+        self.verbose = False
+        self.running = False
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        self._buffers: Dict[Tuple[str, ...], List[str]] = {}
+        # When each buffer's oldest line arrived
+        self._buffered_at: Dict[Tuple[str, ...], float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def install(self, mode: str = "text") -> None:
+        """Routes sys.stdout (and so every print) through the pipeline"""
+        # Records are formatted by the writer, so finish the queued ones in the old mode first
+        self.flush()
+        with self._lock:
+            self.mode = mode
+            if self.running:
+                return
+            self.stream = self.stream or sys.stdout
+            sys.stdout = PipelineStream(self, self.stream)
+            self.running = True
+            self._thread = threading.Thread(target=self._write_loop, name="output-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, args: Tuple[Any, ...], level: str = "info", sep: str = " ", end: str = "\n", tags: Optional[Dict[str, str]] = None) -> None:
+        """Queues print-style args; nothing is formatted here"""
+        if self.quiet or (level == "verbose" and not self.verbose):
+            return
+        record = (time.time(), level, tags if tags is not None else current_tags(), args, sep, end)
+        if self.running:
+            self._queue.put(record)
+        else:
+            self._write(self._format(record), self.stream or sys.stdout)
+
+    def flush(self) -> None:
+        """Blocks until everything queued so far has been written"""
+        if not self.running:
+            return
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def close(self) -> None:
+        if not self.running:
+            return
+        self.flush()
+        with self._lock:
+            self.running = False
+            self._queue.put(None)
+            if isinstance(sys.stdout, PipelineStream) and sys.stdout.pipeline is self:
+                sys.stdout = self.stream
+        self._thread.join()
+
+    def _format(self, record: Tuple) -> List[str]:
+        timestamp, level, tags, args, sep, end = record
+        text = sep.join(str(arg) for arg in args) + end
+        if level == "verbose" and self.mode == "text":
+            text = "\n[Verbose] " + text
+        if self.mode != "json":
+            return [text]
+        lines = text.split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        return [
+            json.dumps({"ts": timestamp, "level": level, **{name: tags.get(name) for name in _TAG_NAMES}, "message": line}) + "\n"
+            for line in lines
+        ]
+
+    def _write(self, lines: List[str], stream) -> None:
+        try:
+            stream.write("".join(lines))
+            stream.flush()
+        except (OSError, ValueError):
+            # Closed or broken console (e.g. piped into head); keep draining so callers never block
+            pass
+
+    def _flush_buffer(self, source: Tuple[str, ...]) -> None:
+        self._buffered_at.pop(source, None)
+        self._write(self._buffers.pop(source), self.stream)
+
+    def _flush_buffers(self, older_than: Optional[float] = None) -> None:
+        for source, since in list(self._buffered_at.items()):
+            if older_than is None or since <= older_than:
+                self._flush_buffer(source)
+
+    def _write_loop(self) -> None:
+        while True:
+            # Wake up in time for the oldest buffer, so a busy source never holds another one back
+            oldest = min(self._buffered_at.values(), default=None)
+            timeout = None if oldest is None else max(0.0, oldest + _FLUSH_INTERVAL - time.monotonic())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = ()
+            if record is None:
+                self._flush_buffers()
+                return
+            if record and record[0] == "flush":
+                self._flush_buffers()
+                record[1].set()
+                continue
+            if record:
+                source = tuple(record[2].get(name, "") for name in _TAG_NAMES)
+                if not any(source):
+                    # Untagged output (the main thread, e.g. a fan-out summary) must come after
+                    # everything the workers printed before it
+                    self._flush_buffers()
+                    self._write(self._format(record), self.stream)
+                else:
+                    if source not in self._buffers:
+                        self._buffers[source] = []
+                        self._buffered_at[source] = time.monotonic()
+                    self._buffers[source].extend(self._format(record))
+                    if len(self._buffers[source]) >= _BUFFER_LINES:
+                        self._flush_buffer(source)
+            self._flush_buffers(older_than=time.monotonic() - _FLUSH_INTERVAL)
+
+
+class PipelineStream(io.TextIOBase):
+    """sys.stdout replacement that hands complete lines to the pipeline, per printing thread"""
+
+    def __init__(self, pipeline: OutputPipeline, stream) -> None:
+        super().__init__()
+        self.pipeline = pipeline
+        self.stream = stream
+        self._partial = threading.local()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.stream, "encoding", "utf-8")
+
+    def isatty(self) -> bool:
+        return self.stream.isatty()
+
+    def fileno(self) -> int:
+        return self.stream.fileno()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if self.pipeline.quiet:
+            return len(text)
+        pending = getattr(self._partial, "text", "") + text
+        complete, newline, rest = pending.rpartition("\n")
+        self._partial.text = rest
+        if newline:
+            self.pipeline.emit((complete,), end="\n")
+        return len(text)
+
+    def flush(self) -> None:
+        # A partial line is only flushed on request, e.g. by input() showing its prompt
+        pending = getattr(self._partial, "text", "")
+        if pending:
+            self._partial.text = ""
+            self.pipeline.emit((pending,), end="")
+        self.pipeline.flush()
+
+
+OUTPUT = OutputPipeline()
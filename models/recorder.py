@@ -1,30 +1,180 @@
+import atexit
 import copy
+import getpass
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import RECORD_FILE as _RECORD_FILE, REPLAY_FILE as _REPLAY_FILE
+from models.errors import ReplayError
+from models.globals import printv
+
+# Bump when the fixture layout changes
+_FIXTURE_VERSION = 1
 
 
 class CommandRecorder:
-    def __init__(self):
+    """Records what external commands returned, or replays those responses instead of running them.
+
+    Every call site that shells out (Runner, TapeInfo.run_command, spectra's ssh wrapper) goes
+    through intercept(). With mode "record" the command runs and its output, exit code, timing
+    and environment are kept and written to a JSON fixture file at exit. With mode "replay" the
+    command is never run; the next recorded response for the same (kind, node, command) is
+    returned, so repeated commands replay in the order they were recorded.
+    """
+
+    def __init__(self, mode: Optional[str] = None, path: Optional[str] = None) -> None:
         self.parts = {}
         self.commands = []
-    
+        self.mode = None
+        self.path = None
+        self.responder: Optional[Callable[[str, str, Optional[str]], Optional[Dict[str, Any]]]] = None
+        self._responses: Dict[Tuple[str, Optional[str], str], deque] = {}
+        self._lock = threading.Lock()
+        self._saved = False
+        if mode:
+            self.start(mode, path)
+
+    @staticmethod
+    def from_env() -> "CommandRecorder":
+        if _REPLAY_FILE:
+            return CommandRecorder("replay", _REPLAY_FILE)
+        if _RECORD_FILE:
+            return CommandRecorder("record", _RECORD_FILE)
+        return CommandRecorder()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def start(self, mode: str, path: str) -> None:
+        """Starts recording to, or replaying from, the fixture file at path"""
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown recorder mode '{mode}', expected record or replay")
+        self.mode, self.path, self.responder = mode, path, None
+        if self.replaying:
+            self.load(path)
+        elif not self._saved:
+            self._saved = True
+            atexit.register(self.dump)
+        printv(f"{mode.capitalize()}ing commands: {path}")
+
+    def simulate(self, responder: Callable[[str, str, Optional[str]], Optional[Dict[str, Any]]]) -> None:
+        """Replays from responder(kind, command, node) instead of a fixture file, e.g. a simulated library"""
+        self.mode, self.path, self.responder = "replay", "simulator", responder
+
     def add_command(self, command):
-        self.command.append(command)
-    
+        if isinstance(command, str):
+            command = {"command": command}
+        with self._lock:
+            self.commands.append(command)
+
     def add_part(self, index, part):
         if index not in self.parts:
             self.parts[index] = [str(part)]
         else:
             self.parts[index].append(str(part))
-    
+
     def finalize_part(self, index):
         if index in self.parts:
-            self.commands.append(' '.join(str(self.parts[index])))
+            self.add_command(' '.join(self.parts[index]))
             del self.parts[index]
-    
+
     def finalize(self):
-        return list(copy.deepcopy(self.commands))
-    
-    def dump(self):
-        del self
+        with self._lock:
+            return list(copy.deepcopy(self.commands))
+
+    def load(self, path: str) -> None:
+        with open(path, "r") as f:
+            fixtures = json.load(f)
+        self.commands = fixtures.get("commands", [])
+        self._responses = {}
+        for entry in self.commands:
+            self._responses.setdefault(self._key(entry["kind"], entry["command"], entry.get("node")), deque()).append(entry)
+        printv(f"Loaded {len(self.commands)} recorded commands from {path}")
+
+    def dump(self, path: Optional[str] = None) -> None:
+        """Writes the recorded commands to the fixture file"""
+        path = path or self.path
+        if not path or not self.recording:
+            return
+        fixtures = {"version": _FIXTURE_VERSION, "commands": self.finalize()}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".fixtures-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(fixtures, f, indent=4)
+        os.replace(tmp, path)
+        printv(f"Recorded {len(fixtures['commands'])} commands to {path}")
+
+    @staticmethod
+    def _key(kind: str, command: str, node: Optional[str] = None) -> Tuple[str, Optional[str], str]:
+        return kind, node, command
+
+    def replay(self, kind: str, command: str, node: Optional[str] = None) -> Dict[str, Any]:
+        """Returns the next recorded response for command"""
+        if self.responder:
+            entry = self.responder(kind, command, node)
+            if entry is None:
+                raise ReplayError(f"[{kind}] {node + ': ' if node else ''}{command}", self.path)
+            return entry
+        with self._lock:
+            responses = self._responses.get(self._key(kind, command, node))
+            if not responses:
+                raise ReplayError(f"[{kind}] {node + ': ' if node else ''}{command}", self.path)
+            # The last response of a command keeps answering once its recorded calls run out
+            entry = responses.popleft() if len(responses) > 1 else responses[0]
+        printv(f"Replaying [{kind}] {command}")
+        return entry
+
+    def record(self, kind: str, command: str, response: Dict[str, Any], wall_s: float, node: Optional[str] = None) -> None:
+        self.add_command({
+            "kind": kind,
+            "node": node,
+            "command": command,
+            "env": {"host": socket.gethostname(), "user": getpass.getuser(), "cwd": os.getcwd()},
+            "stdout": response.get("stdout"),
+            "stderr": response.get("stderr"),
+            "returncode": response.get("returncode"),
+            "wall_s": wall_s,
+            "timestamp": time.time(),
+        })
+
+    def intercept(self, kind: str, command: str, execute: Callable[[], Dict[str, Any]], node: Optional[str] = None) -> Dict[str, Any]:
+        """Runs execute() (or replays its recorded response) for command.
+
+        Args:
+            kind (str): Which call site ran the command, e.g. "runner" or "ssh".
+            command (str): The command, without anything that changes between runs (such as ssh control paths).
+            execute (callable): Runs the command and returns {"stdout", "stderr", "returncode"}.
+            node (str, optional): Where the command runs, if not locally.
+        """
+        if self.replaying:
+            return self.replay(kind, command, node)
+        start = time.monotonic()
+        response = execute()
+        if self.recording:
+            self.record(kind, command, response, time.monotonic() - start, node)
+        return response
+
+    async def aintercept(self, kind: str, command: str, execute: Callable[[], Any], node: Optional[str] = None) -> Dict[str, Any]:
+        """intercept() for an awaitable execute"""
+        if self.replaying:
+            return self.replay(kind, command, node)
+        start = time.monotonic()
+        response = await execute()
+        if self.recording:
+            self.record(kind, command, response, time.monotonic() - start, node)
+        return response
+
 
-cmd = CommandRecorder()
-cmd.add_command("echo 'hello")
+RECORDER = CommandRecorder.from_env()
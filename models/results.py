@@ -0,0 +1,191 @@
+import array
+import bisect
+import gzip
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import RESULTS_DIR as _RESULTS_DIR
+from models.globals import printv
+
+# One index entry per this many lines keeps the index tiny even for multi-GB outputs;
+# a match's line number is the nearest entry plus the newlines counted after it
+_INDEX_STRIDE = 1024
+_STDERR_PREFIX = "[stderr] "
+
+
+def _safe_name(name: Optional[str]) -> str:
+    return re.sub(r"[^\w.@-]+", "_", name or "none")
+
+
+class ResultStore:
+    """Command output spooled to disk, one file per node and step, with a sparse line index.
+
+    Layout under the results directory:
+        catalog.jsonl                        one entry per spooled step
+        <run>/<node>/<NNN>-<step>.log[.gz]   output lines as they arrived, stderr ones prefixed "[stderr] "
+        <run>/<node>/<NNN>-<step>.idx        byte offset of every _INDEX_STRIDE-th line start
+
+    Searches filter on the catalog first and then scan only the matching files, through mmap
+    for plain files and streamed decompression for compressed ones, so no output is ever held
+    in memory whole.
+    """
+
+    def __init__(self, directory: str = _RESULTS_DIR) -> None:
+        self.directory = directory
+        self.enabled = False
+        self.compress = False
+        self.run_id: Optional[str] = None
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def catalog(self) -> str:
+        return os.path.join(self.directory, "catalog.jsonl")
+
+    def enable(self, compress: bool = False) -> None:
+        self.enabled, self.compress = True, compress
+        self.run_id = self.run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        printv(f"Spooling results to {os.path.join(self.directory, self.run_id)}")
+
+    def reserve(self, node: str, step: Optional[str] = None) -> str:
+        """Returns the (uncompressed) file the next step's output on node should be written to"""
+        node = _safe_name(node)
+        with self._lock:
+            self._counters[node] = self._counters.get(node, 0) + 1
+            number = self._counters[node]
+        directory = os.path.join(self.directory, self.run_id, node)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{number:03d}-{_safe_name(step or 'cmd')}.log")
+
+    def write(self, path: str, stdout: Optional[str], stderr: Optional[str]) -> None:
+        with open(path, "a") as f:
+            f.write(stdout or "")
+            if stdout and not stdout.endswith("\n"):
+                f.write("\n")
+            for line in (stderr or "").splitlines(keepends=True):
+                f.write(f"{_STDERR_PREFIX}{line}")
+
+    def commit(self, path: str, **meta: Any) -> Dict[str, Any]:
+        """Indexes (and optionally compresses) a finished step file and adds it to the catalog"""
+        if not os.path.exists(path):
+            open(path, "w").close()
+        index, lines = array.array("Q"), 0
+        with open(path, "rb") as source:
+            offset = 0
+            for line in source:
+                if lines % _INDEX_STRIDE == 0:
+                    index.append(offset)
+                offset += len(line)
+                lines += 1
+        with open(f"{os.path.splitext(path)[0]}.idx", "wb") as f:
+            index.tofile(f)
+        size = os.path.getsize(path)
+        if self.compress:
+            with open(path, "rb") as source, gzip.open(f"{path}.gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+            path = f"{path}.gz"
+        entry = {
+            "run": self.run_id,
+            "timestamp": time.time(),
+            "path": os.path.relpath(path, self.directory),
+            "lines": lines,
+            "bytes": size,
+            **meta,
+        }
+        with self._lock:
+            with open(self.catalog, "a") as f:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+        return entry
+
+    def entries(self, node: Optional[str] = None, workflow: Optional[str] = None, run: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.catalog):
+            return
+        with open(self.catalog, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if node and entry.get("node") != node:
+                    continue
+                if workflow and entry.get("workflow") != workflow:
+                    continue
+                if run and entry.get("run") != run:
+                    continue
+                yield entry
+
+    def _load_index(self, path: str) -> List[int]:
+        index_path = f"{re.sub(r'[.]log([.]gz)?$', '', path)}.idx"
+        index = array.array("Q")
+        try:
+            with open(index_path, "rb") as f:
+                index.frombytes(f.read())
+        except OSError:
+            pass
+        return list(index) or [0]
+
+    def _scan_mmap(self, path: str, regex: "re.Pattern") -> Iterator[tuple]:
+        if not os.path.getsize(path):
+            return
+        index = self._load_index(path)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = 0
+            while True:
+                match = regex.search(mm, position)
+                if not match:
+                    return
+                start = mm.rfind(b"\n", 0, match.start()) + 1
+                end = mm.find(b"\n", match.start())
+                end = len(mm) if end < 0 else end
+                position = end + 1
+                # Matches are line by line, as in _scan_gzip: one that ran past the end of its
+                # line only counts if the pattern also matches within that line
+                if match.end() > end and not regex.search(mm[start:end]):
+                    continue
+                checkpoint = bisect.bisect_right(index, start) - 1
+                line_number = checkpoint * _INDEX_STRIDE + mm[index[checkpoint]:start].count(b"\n") + 1
+                yield line_number, mm[start:end]
+
+    def _scan_gzip(self, path: str, regex: "re.Pattern") -> Iterator[tuple]:
+        with gzip.open(path, "rb") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.rstrip(b"\n")
+                if regex.search(line):
+                    yield line_number, line
+
+    def search(
+        self,
+        pattern: str,
+        node: Optional[str] = None,
+        workflow: Optional[str] = None,
+        run: Optional[str] = None,
+        ignore_case: bool = False,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yields every line matching pattern (a regex) in the spooled results that pass the filters"""
+        regex = re.compile(pattern.encode(), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+        found = 0
+        for entry in self.entries(node, workflow, run):
+            path = os.path.join(self.directory, entry["path"])
+            if not os.path.exists(path):
+                continue
+            scan = self._scan_gzip if path.endswith(".gz") else self._scan_mmap
+            for line_number, line in scan(path, regex):
+                yield {**entry, "line_number": line_number, "line": line.decode(errors="replace")}
+                found += 1
+                if limit and found >= limit:
+                    return
+
+    @staticmethod
+    def print_match(match: Dict[str, Any]) -> None:
+        print(f"{match['run']} {match.get('node')} {match.get('workflow')} {match['path']}:{match['line_number']}: {match['line']}")
+
+
+RESULTS = ResultStore()
@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List
+
+from models.errors import ConfigurationError
+from models.globals import printv
+from models.output import current_tags, tagged
+
+
+class StepScheduler:
+    """Runs named workflow steps as a dependency graph.
+
+    A step starts as soon as every step it "needs" has succeeded, so independent
+    branches overlap and the whole graph finishes in critical-path time. Steps that
+    depend on a failed step are skipped.
+    """
+
+    def __init__(self, steps: Dict[str, Dict[str, Any]], max_workers: int = 8) -> None:
+        self.steps = steps
+        self.max_workers = max(1, max_workers)
+        self.dependents: Dict[str, List[str]] = {name: [] for name in steps}
+        for name, step in steps.items():
+            for dependency in step.get("needs", []):
+                if dependency not in steps:
+                    raise ConfigurationError(message=f"Step '{name}' needs unknown step '{dependency}'")
+                self.dependents[dependency].append(name)
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        pending = {name: len(step.get("needs", [])) for name, step in self.steps.items()}
+        ready = [name for name, count in pending.items() if not count]
+        order = []
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in self.dependents[name]:
+                pending[dependent] -= 1
+                if not pending[dependent]:
+                    ready.append(dependent)
+        if len(order) != len(self.steps):
+            cycle = sorted(name for name in self.steps if name not in order)
+            raise ConfigurationError(message=f"Workflow steps have a dependency cycle: {', '.join(cycle)}")
+        return order
+
+    def _skip(self, name: str, results: Dict[str, Dict[str, Any]]) -> None:
+        for dependent in self.dependents[name]:
+            if dependent not in results:
+                printv(f"Skipping step '{dependent}', '{name}' did not succeed")
+                results[dependent] = {"status": "skipped", "wall_s": 0.0}
+                self._skip(dependent, results)
+
+    def run(self, execute: Callable[[str, Dict[str, Any]], bool]) -> Dict[str, Dict[str, Any]]:
+        """Runs every step through execute(name, step), which returns True on success.
+
+        Returns:
+            dict: {step: {"status": "ok" | "failed" | "skipped", "wall_s": float}} in topological order.
+        """
+        pending = {name: len(step.get("needs", [])) for name, step in self.steps.items()}
+        results: Dict[str, Dict[str, Any]] = {}
+        tags = current_tags()
+
+        def timed(name: str) -> Dict[str, Any]:
+            start = time.monotonic()
+            try:
+                with tagged(tags, step=name):
+                    ok = execute(name, self.steps[name])
+            except (Exception, SystemExit) as e:
+                print(f"Step '{name}' raised: {e}")
+                ok = False
+            return {"status": "ok" if ok else "failed", "wall_s": time.monotonic() - start}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(timed, name): name for name in self.order if not pending[name]}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    results[name] = future.result()
+                    printv(f"Step '{name}' {results[name]['status']} in {results[name]['wall_s']:.2f}s")
+                    if results[name]["status"] != "ok":
+                        self._skip(name, results)
+                        continue
+                    for dependent in self.dependents[name]:
+                        pending[dependent] -= 1
+                        if not pending[dependent] and dependent not in results:
+                            futures[pool.submit(timed, dependent)] = dependent
+        return {name: results[name] for name in self.order}
+
+    @staticmethod
+    def print_summary(results: Dict[str, Dict[str, Any]], elapsed: float) -> None:
+        print(f"\n****************************************************")
+        print(f"    Workflow steps: {sum(r['status'] == 'ok' for r in results.values())}/{len(results)} succeeded in {elapsed:.2f}s")
+        print(f"****************************************************")
+        for name, result in results.items():
+            print(f"    {name:<30} {result['wall_s']:>8.2f}s  {result['status']}")
+        print(f"****************************************************\n")
@@ -1,8 +1,9 @@
-import json
-import os
 import socket
 
 from config import SERVER_SPECS as _SERVER_SPECS
+from models.errors import ConfigurationError
+from models.inventory import INVENTORY, SELECTORS
+from models.tracing import TRACER
 
 class Configuration:
     def __init__(self, node=None, service=None, device_type=None, mover_type=None):
@@ -13,18 +14,58 @@ class Configuration:
     
     @staticmethod
     def from_json(node):
-        if os.path.exists(_SERVER_SPECS):
-            with open(_SERVER_SPECS, "r+") as cfg_file:
-                config = json.loads(cfg_file.read())
-                if config and node in config:
-                    return Configuration(
-                        node, 
-                        config[node].get("service", None),
-                        config[node].get("device_type", None),
-                        config[node].get("mover_type", None)
-                    )
+        with TRACER.span("Configuration.from_json", node=node):
+            spec = INVENTORY.get(node)
+        if spec:
+            return Configuration(
+                node, 
+                spec.get("service", None),
+                spec.get("device_type", None),
+                spec.get("mover_type", None)
+            )
         return Configuration(node)
     
+    @staticmethod
+    def resolve_nodes(expression):
+        """Expands a node expression into a list of node names.
+
+        Args:
+            expression (str): Comma-separated node names. Entries prefixed with '@'
+                name a host group; every node in server_specs.json whose "groups"
+                list contains that name is included.
+
+        Returns:
+            list: Unique node names, in the order they were given.
+        """
+        nodes = []
+        for item in expression.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if item.startswith("@"):
+                members = INVENTORY.select(group=item[1:])
+                if not members:
+                    raise ConfigurationError(message=f"Host group '{item[1:]}' has no nodes in {_SERVER_SPECS}")
+                nodes.extend(members)
+            else:
+                nodes.append(item)
+        return list(dict.fromkeys(nodes))
+    
+    @staticmethod
+    def select_nodes(selectors):
+        """Resolves KEY=VALUE selectors (service, device, mover, group) to the matching nodes.
+
+        Args:
+            selectors (list): e.g. ["service=cta", "device=tape", "mover=ibm"]
+        """
+        criteria = {}
+        for selector in selectors:
+            key, _, value = selector.partition("=")
+            if key not in SELECTORS or not value:
+                raise ConfigurationError(message=f"Invalid selector '{selector}', expected one of: {', '.join(f'{k}=VALUE' for k in SELECTORS)}")
+            criteria[key] = value
+        return INVENTORY.select(**criteria)
+    
     def is_remote(self):
         return self.node != socket.gethostname()
     
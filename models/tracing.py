@@ -0,0 +1,101 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from models.globals import printv
+
+
+class Tracer:
+    """Collects timed spans and writes them as Chrome trace JSON (chrome://tracing, ui.perfetto.dev).
+
+    Spans cost a single flag check while tracing is off, so call sites can stay instrumented.
+    Each thread gets its own track; concurrent asyncio tasks can pass a `lane` so their
+    overlapping spans land on separate tracks too.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+        self._lanes: Dict[Any, int] = {}
+        self._profiler = None
+        self._profile_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def start(self, path: str, profile_path: Optional[str] = None) -> None:
+        """Starts tracing; the trace (and cProfile stats, if profile_path is given) are written at exit"""
+        self.enabled, self.path = True, path
+        if profile_path:
+            import cProfile
+
+            self._profile_path = profile_path
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        atexit.register(self.write)
+
+    def _track(self, lane: Any = None) -> int:
+        key = lane if lane is not None else threading.get_ident()
+        with self._lock:
+            if key not in self._lanes:
+                self._lanes[key] = len(self._lanes) + 1
+                name = str(lane) if lane is not None else threading.current_thread().name
+                self.events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": self._lanes[key], "args": {"name": name}})
+            return self._lanes[key]
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "phase", lane: Any = None, **args: Any) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": self._track(lane),
+                "args": {key: str(value) for key, value in args.items()},
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def traced(self, name: Optional[str] = None, category: str = "phase"):
+        """Decorator that wraps every call of a function in a span"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.span(name or function.__qualname__, category):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def write(self) -> None:
+        if self._profiler:
+            self._profiler.disable()
+            self._profiler.dump_stats(self._profile_path)
+            printv(f"Wrote cProfile stats to {self._profile_path} (python -m pstats {self._profile_path})")
+            self._profiler = None
+        if not self.path:
+            return
+        with self._lock:
+            events = list(self.events)
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"Wrote trace of {sum(event['ph'] == 'X' for event in events)} spans to {self.path} (open in ui.perfetto.dev)")
+
+
+TRACER = Tracer()
@@ -1,37 +1,58 @@
 import argparse
 import os
 import sys
-from typing import Any, Dict, List
+import time
+from typing import Any, Dict, List, Optional
 
 from models.errors import ConfigurationError
 from models.helpers import WorkflowParser
 from models.globals import printv
+from models.metrics import METRICS
+from models.tracing import TRACER
 
+_WORKFLOW_LABELS = ["workflow", "node", "mover"]
+_WORKFLOW_SECONDS = METRICS.histogram("sds_workflow_duration_seconds", "Wall time of workflow runs.", _WORKFLOW_LABELS)
+_WORKFLOW_RUNS = METRICS.counter("sds_workflow_runs", "Workflow runs, by outcome.", _WORKFLOW_LABELS + ["status"])
+_WORKFLOW_METRICS = METRICS.gauge(
+    "sds_workflow_metric", "Last value of each SDS_METRIC a workflow reported, e.g. mover throughput.", _WORKFLOW_LABELS + ["metric"]
+)
 
 
 class Workflow:
     """Workflow object that as the baseline for our custom workflows"""
 
-    def __init__(self, data) -> None:
+    def __init__(self, data, key: Optional[str] = None) -> None:
         self.name: str = data.get("title")
+        # The workflows.json key it is run by (--run); history, metrics and results are recorded under it
+        self.key: str = key or self.name
         self.description: str = data.get("description")
         self.requirements: Dict[str, Any] = data.get("requirements")
         self.commands: List[str] = data.get("commands")
+        # Optional DAG form: {name: {"commands": [...], "needs": [names], "node": "host"}}
+        self.steps: Optional[Dict[str, Dict[str, Any]]] = data.get("steps")
         self.params: List[Dict[str, Any]] = data.get("params")
-        self.init_parser()
+        self._parser: Optional[WorkflowParser] = None
 
     def init_parser(self) -> None:
-        self.parser = WorkflowParser.create_subparser(
+        self._parser = WorkflowParser.create_subparser(
             name=self.name, description=self.description
         )
-        self.parser.set_arguments(self.params)
+        self._parser.set_arguments(self.params)
+
+    @property
+    def parser(self) -> WorkflowParser:
+        # Built on first use so listing or running one workflow doesn't pay for every parser
+        if self._parser is None:
+            self.init_parser()
+        return self._parser
 
     def get_info(self) -> None:
         self.parser.print_help()
 
     def get_description(self) -> None:
-        print(self.parser.description)
+        print(WorkflowParser.parse_description(self.name, "GET", self.description))
         
+    @TRACER.traced("Workflow._validate_requirements")
     def _validate_requirements(self, operator):
         if not operator or not operator.config:
             raise ConfigurationError(operator.config,"Operator is not configured properly.")
@@ -60,18 +81,92 @@ class Workflow:
                         exists[line.split(":")[-1].strip()] = True
         return all(exists.values())
     
-    def _finalized_commands(self, args):
+    def _finalized_commands(self, args, mover=None, lines=None):
         commands = []
-        for line in self.commands:
+        for line in self.commands if lines is None else lines:
+            # Device placeholders ($device_type, $mover_type, $slot) come from the mover being exercised
+            for key, value in (mover or {}).items():
+                line = line.replace(f"${key}", str(value))
             for params in self.params:
                 if hasattr(args, params["name"]):
                     line = line.replace(f"${params['name']}", getattr(args, params["name"]))
             commands.append(line)
         return commands
 
-    def run(self, operator, *args): 
+    def run(self, operator, *args, mover=None): 
         self._validate_requirements(operator)
-        commands = self._finalized_commands(*args)
-        operator.run_command(commands)
+        start, first_step = time.monotonic(), len(operator.steps)
+        try:
+            with TRACER.span(f"workflow:{self.name}", node=operator.config.node, mover=(mover or {}).get("mover_type")):
+                if self.steps:
+                    return self._run_steps(operator, *args, mover=mover)
+                commands = self._finalized_commands(*args, mover=mover)
+                operator.run_command(commands)
+        finally:
+            self._observe(operator, operator.steps[first_step:], time.monotonic() - start, mover)
+
+    def _observe(self, operator, steps, elapsed, mover=None):
+        """Adds a finished run to the run metrics, including any SDS_METRIC values its commands reported"""
+        labels = {
+            "workflow": self.key,
+            "node": operator.config.node,
+            "mover": (mover or {}).get("mover_type") or operator.config.mover or "",
+        }
+        failed = not steps or any(step["exit_code"] for step in steps)
+        _WORKFLOW_RUNS.inc(status="failed" if failed else "ok", **labels)
+        _WORKFLOW_SECONDS.observe(elapsed, **labels)
+        for step in steps:
+            for metric, value in step.get("metrics", {}).items():
+                _WORKFLOW_METRICS.set(value, metric=metric, **labels)
+
+    def _run_steps(self, operator, args=None, mover=None):
+        """Runs the workflow's steps through the DAG scheduler, each on its own (or the operator's) node.
+
+        Steps finish in whatever order the scheduler runs them, so their records and output are
+        collected per step and added to the operator in declaration order afterwards.
+        """
+        from models.scheduler import StepScheduler
+        step_operators = {}
+        
+        def execute(name, step):
+            node = self._finalized_commands(args, mover, [step["node"]])[0] if step.get("node") else None
+            step_operator = operator.for_node(node)
+            step_operator.defer_output = True
+            step_operators[name] = step_operator
+            # A step that prints nothing still succeeds; its exit code decides
+            step_operator.run_command(self._finalized_commands(args, mover, step["commands"]), require_output=False)
+            for record in step_operator.steps:
+                record["step"] = name
+            return bool(step_operator.steps) and not step_operator.steps[-1]["exit_code"]
+        
+        start = time.monotonic()
+        results = StepScheduler(self.steps, operator.jobs).run(execute)
+        for name in self.steps:
+            if name in step_operators:
+                operator.steps.extend(step_operators[name].steps)
+                operator.results.extend(step_operators[name].results)
+        failed = [f"{name} ({result['status']})" for name, result in results.items() if result["status"] != "ok"]
+        if failed:
+            operator.error = f"step(s) failed: {', '.join(failed)}"
+        # Deferred operators print the summary with their results, once the run is over
+        operator.step_summary = (results, time.monotonic() - start)
+        if not operator.defer_output:
+            for name in self.steps:
+                if name in step_operators and not step_operators[name].stream:
+                    step_operators[name].print_results()
+            StepScheduler.print_summary(*operator.step_summary)
+        return results
 
-        
\ No newline at end of file
+    async def arun(self, operator, *args, timeout=None, semaphore=None):
+        import asyncio
+        # Requirement checks are synchronous, keep them off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._validate_requirements, operator)
+        start, first_step = time.monotonic(), len(operator.steps)
+        try:
+            if self.steps:
+                # Steps already run concurrently on the scheduler's threads
+                return await asyncio.get_running_loop().run_in_executor(None, self._run_steps, operator, *args)
+            commands = self._finalized_commands(*args)
+            await operator.arun_command(commands, timeout=timeout, semaphore=semaphore)
+        finally:
+            self._observe(operator, operator.steps[first_step:], time.monotonic() - start)
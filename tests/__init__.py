@@ -1,5 +1,15 @@
-from cta.tape_info import get_device_info_ibm, get_device_info_spectra
+import importlib
 
-CTA_TESTS ={
-    
-}
\ No newline at end of file
+# Service/mover discovery plugins, keyed by (service, device, mover). Modules are only
+# imported when a plugin is first requested, so nothing here runs (or reads config) at startup.
+PLUGINS = {
+    ("cta", "tape", "ibm"): "tests.cta.tape.ibm",
+    ("cta", "tape", "spectra"): "tests.cta.tape.spectra",
+}
+
+def load_plugin(service, device, mover):
+    """Imports and returns the plugin module for a service/device/mover combination"""
+    key = (service.lower(), device.lower(), mover.lower())
+    if key not in PLUGINS:
+        raise KeyError(f"No plugin registered for {'/'.join(key)}")
+    return importlib.import_module(PLUGINS[key])
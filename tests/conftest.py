@@ -0,0 +1,19 @@
+import pytest
+
+import models.manifest
+import models.operator
+from models.cache import TTLCache
+from models.history import HISTORY
+from models.inventory import INVENTORY
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """Keeps detection, manifest and inventory caches and the run history out of the user's real ones"""
+    cache = tmp_path / "cache"
+    monkeypatch.setattr(models.operator, "_detections", TTLCache("detection", models.operator._DETECTION_TTL, directory=str(cache)))
+    monkeypatch.setattr(models.manifest, "_manifests", TTLCache("manifests", ttl=float("inf"), directory=str(cache)))
+    monkeypatch.setattr(INVENTORY, "db_path", str(cache / "inventory.sqlite3"))
+    monkeypatch.setattr(INVENTORY, "_db", None)
+    monkeypatch.setattr(HISTORY, "path", str(tmp_path / "history.jsonl"))
+    return tmp_path
@@ -0,0 +1,12 @@
+import pytest
+
+from tests.cta.tape import spectra
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keeps SLAPI tables cached by the simulated libraries out of the real cache directory"""
+    monkeypatch.setattr(spectra, "_CACHE_DIR", str(tmp_path / "cache"))
+    spectra._cache.cache_clear()
+    yield tmp_path / "cache"
+    spectra._cache.cache_clear()
@@ -23,8 +23,8 @@ def get_device_info(tape_info, devices):
             logical_library = item['logicalLibrary'].upper()
             location = item['location']
             elementAddress = item['elementAddress']
-            drive_ordinal = tape_info.run_command(f"cta-smc -q D | awk -v addr='{elementAddress}' '{{if ($2 == addr) print $1}}c'")
-            tape_drive_device = tape_info.run_command(f"/usr/bin/sg_map | /usr/bin/grep {tape_device} | /usr/bin/awk '{{print $2}}'")
+            drive_ordinal = tape_info.get_drive_ordinal(elementAddress)
+            tape_drive_device = tape_info.get_drive_device(tape_device)
             drive_name = tape_info.get_device_name(logical_library, location)
             entry = {
                 "DriveLogicalLibrary": logical_library,
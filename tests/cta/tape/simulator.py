@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""Simulated tape library for exercising discovery at scale.
+
+LibrarySimulator invents a consistent library (drives, serials, SCSI generics,
+partitions, element addresses) and answers the commands discovery runs: `lsscsi -g`,
+`sg_inq`, `sg_map`, `cta-smc -q D`, ITDT `RoS GET /v1/drives` and the SLAPI list
+tables. It plugs into the command recorder, so TapeInfo, ibm.py and spectra.py run
+unchanged and no process is started. Every answered command is counted as the
+process spawn (or ssh round trip) it would have been on a real node.
+
+Run from the repository root:
+    python -m tests.cta.tape.simulator --drives 24 48 100 200 --partitions 2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import string
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from models.recorder import RECORDER
+from tests.cta.tape import spectra
+from tests.cta.tape_info import TapeInfo
+
+_BATCH_COMMAND = re.compile(r"\{ \((.*?)\) > \$d/\d+; echo \$\? > \$d/\d+\.rc; \} &")
+_BATCH_MARKER = "@@SDS-BATCH-OUTPUT@@"
+
+
+class LibrarySimulator:
+    """A fake SPECTRA or IBM library with `drives` drives spread over `partitions` partitions"""
+
+    def __init__(self, drives: int = 24, partitions: int = 1, methodology: str = "SPECTRA", latency: float = 0.0) -> None:
+        self.methodology = methodology.upper()
+        self.latency = latency
+        self.library_name = "SDS_SIM1"
+        # SLAPI partition names cannot contain digits; the first one is the partition CTA queries
+        self.partitions = ["zzCTA"] + [f"zzSim{string.ascii_uppercase[i % 26] * (i // 26 + 1)}" for i in range(partitions - 1)]
+        self.changers = [
+            {"generic": f"/dev/sg{i}", "serial": f"00001300{i:05d}", "partition": partition}
+            # IBM libraries expose a changer per logical library, Spectra a single one
+            for i, partition in enumerate(self.partitions if self.methodology == "IBM" else self.partitions[:1])
+        ]
+        self.drives = []
+        for i in range(drives):
+            partition = self.partitions[i % len(self.partitions)]
+            self.drives.append({
+                "serial": f"00{7800000000 + i}",
+                "generic": f"/dev/sg{len(self.changers) + i}",
+                "tape": f"/dev/st{i}",
+                "partition": partition,
+                "partDriveNumber": str(i // len(self.partitions) + 1),
+                "elementAddress": str(256 + i),
+                "ordinal": str(i),
+                "id": f"FR{i // 48 + 1}/DBA{i // 12 % 4 + 1}/fLTO-DRV{i % 12 + 1}",
+                "location": f"F{i // 48 + 1}C{i // 12 % 4 + 1}R{i % 12 + 1}",
+            })
+        # SLAPI tables whose query exits non-zero, e.g. {"drivelist"}
+        self.failing: set = set()
+        self.spawns: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _changer_vendor(self) -> str:
+        return "SPECTRA" if self.methodology == "SPECTRA" else "IBM"
+
+    def lsscsi(self) -> str:
+        lines = [
+            f"[0:0:{i}:0]    mediumx {self._changer_vendor():<8} PYTHON           5500  -          {changer['generic']}"
+            for i, changer in enumerate(self.changers)
+        ]
+        lines += [
+            f"[0:0:{len(self.changers) + i}:0]    tape    IBM      ULT3580-TD8      MB61  {drive['tape']:<10} {drive['generic']}"
+            for i, drive in enumerate(self.drives)
+        ]
+        return "\n".join(lines) + "\n"
+
+    def serial(self, generic: str) -> str:
+        for device in self.changers + self.drives:
+            if device["generic"] == generic:
+                return device["serial"]
+        return ""
+
+    def sg_inq(self, generic: str) -> str:
+        return f"standard INQUIRY:\n  Vendor identification: IBM\n  Unit serial number: {self.serial(generic)}\n"
+
+    def sg_map(self) -> str:
+        lines = [changer["generic"] for changer in self.changers]
+        lines += [f"{drive['generic']}  {drive['tape']}" for drive in self.drives]
+        return "\n".join(lines) + "\n"
+
+    def cta_smc_drives(self) -> str:
+        lines = ["Drive Ordinal  Element Addr.  Status    Vid"]
+        lines += [f"{drive['ordinal']:>13}  {drive['elementAddress']:>13}  free" for drive in self.drives]
+        return "\n".join(lines) + "\n"
+
+    def itdt_drives(self) -> str:
+        return json.dumps([
+            {
+                "sn": drive["serial"].lstrip("0"),
+                "logicalLibrary": f"ll_{drive['partition']}",
+                "location": f"drive_{drive['location']}",
+                "elementAddress": int(drive["elementAddress"]),
+            }
+            for drive in self.drives
+        ])
+
+    def _slapi_header(self, title: str) -> List[str]:
+        return [f"SLAPI {title}", "", "-" * 60, title, "-" * 60]
+
+    def librarysettingslist(self) -> str:
+        return f"LibraryName  AutoClean  Firmware\n{self.library_name}  enabled  K4.2.0\n"
+
+    def drivelist(self) -> str:
+        lines = self._slapi_header("ID  DriveStatus  Partition  PartDriveNum  Type  SerialNumber")
+        lines += [
+            f"{drive['id']}  Ready  {drive['partition']}  {drive['partDriveNumber']}  LTO-8  {drive['serial']}"
+            for drive in self.drives
+        ]
+        return "\n".join(lines) + "\n"
+
+    def inventorylist(self, partition: str) -> str:
+        lines = self._slapi_header("Partition  Type  ElementAddress  Number")
+        lines += [
+            f"{drive['partition']}  drive  {drive['elementAddress']}  {drive['partDriveNumber']}"
+            for drive in self.drives if drive["partition"] == partition
+        ]
+        return "\n".join(lines) + "\n"
+
+    def slapi(self, command: str) -> Optional[str]:
+        words = command.split()
+        if "librarysettingslist" in words:
+            return self.librarysettingslist()
+        if "drivelist" in words:
+            return self.drivelist()
+        if "inventorylist" in words:
+            return self.inventorylist(words[-1])
+        return None
+
+    def execute(self, command: str) -> Optional[str]:
+        """Returns what command prints on the simulated node, or None if it is not simulated"""
+        if "lsscsi -g" in command:
+            return self.lsscsi()
+        if command.startswith("for dev in") and "sg_inq" in command:
+            devices = command[len("for dev in "):command.index(";")].split()
+            return "\n".join(f"{device} {self.serial(device)}" for device in devices) + "\n"
+        if "sg_inq" in command:
+            return self.sg_inq(command.split()[-1])
+        if "sg_map" in command:
+            return self.sg_map()
+        if "cta-smc -q D" in command:
+            return self.cta_smc_drives()
+        if "RoS GET /v1/drives" in command:
+            return self.itdt_drives()
+        if _BATCH_MARKER in command:
+            sections = []
+            for inner in _BATCH_COMMAND.findall(command):
+                failed = any(table in inner.split() for table in self.failing)
+                sections.append(f"{_BATCH_MARKER}\n{1 if failed else 0}\n{'' if failed else self.slapi(inner) or ''}")
+            return "".join(sections)
+        if "slapi.py" in command:
+            return self.slapi(command)
+        return None
+
+    def respond(self, kind: str, command: str, node: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Recorder responder: answers command as a fixture entry"""
+        stdout = self.execute(command)
+        if stdout is None:
+            return None
+        with self._lock:
+            self.spawns[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {"kind": kind, "node": node, "command": command, "stdout": stdout, "stderr": "", "returncode": 0}
+
+    @contextlib.contextmanager
+    def simulate(self):
+        """Answers every command discovery runs from this library while the block runs"""
+        directory = tempfile.mkdtemp(prefix="sds-sim-")
+        ini = os.path.join(directory, "spectra.ini")
+        with open(ini, "w") as f:
+            f.write("[ssa]\nuser = sim\nhost = ssa.sim\n\n[slapi]\nserver = slapi.sim\nuser = sim\npassword = sim\n\n[cache]\nttl = 0\n")
+        previous = (RECORDER.mode, RECORDER.path, RECORDER.responder, spectra._SPECTRA_CONFIG)
+        spectra._SPECTRA_CONFIG = ini
+        spectra._settings.cache_clear()
+        spectra._cache.cache_clear()
+        RECORDER.simulate(self.respond)
+        try:
+            yield self
+        finally:
+            spectra.invalidate_cache()
+            RECORDER.mode, RECORDER.path, RECORDER.responder, spectra._SPECTRA_CONFIG = previous
+            spectra._settings.cache_clear()
+            spectra._cache.cache_clear()
+            os.remove(ini)
+            os.rmdir(directory)
+
+
+def discover(simulator: LibrarySimulator) -> Dict[str, Any]:
+    """Runs TapeInfo.get_data against the simulator and measures it"""
+    output = io.StringIO()
+    with simulator.simulate(), contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        tape_info = TapeInfo(refresh=True)
+        data = tape_info.get_data()
+        if simulator.methodology == "SPECTRA":
+            # Same per-drive lookups get_tape_info does after get_data
+            for device in tape_info.devices["tape"]:
+                tape_info.get_drive_device(device["drive_device"])
+                element_address = (data.get(device["serial_num"]) or {}).get("elementAddress")
+                if element_address:
+                    tape_info.get_drive_ordinal(element_address)
+        elapsed = time.perf_counter() - start
+    found = [key for key, value in (data or {}).items() if isinstance(value, dict)]
+    return {
+        "methodology": simulator.methodology,
+        "drives": len(simulator.drives),
+        "partitions": len(simulator.partitions),
+        "discovered": len(found),
+        "wall_s": elapsed,
+        "spawns": sum(simulator.spawns.values()),
+        "spawns_by_kind": dict(simulator.spawns),
+    }
+
+
+def print_summary(runs: List[Dict[str, Any]]) -> None:
+    print("\n****************************************************************************************")
+    print(f"{'methodology':>12} {'drives':>7} {'partitions':>11} {'discovered':>11} {'wall ms':>10} {'spawns':>7}")
+    print("****************************************************************************************")
+    for run in runs:
+        print(
+            f"{run['methodology']:>12} {run['drives']:>7} {run['partitions']:>11} {run['discovered']:>11} "
+            f"{run['wall_s'] * 1000:>10.1f} {run['spawns']:>7}"
+        )
+    print("****************************************************************************************\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tape discovery scale benchmark against a simulated library")
+    parser.add_argument('--drives', type=int, nargs='+', default=[24, 48, 100, 200], help="Drive counts to simulate (default: 24 48 100 200).")
+    parser.add_argument('--partitions', type=int, default=1, help="Partitions (logical libraries) the drives are spread over (default: 1).")
+    parser.add_argument('--methodology', choices=['spectra', 'ibm', 'both'], default='both', help="Which discovery path to exercise (default: both).")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each simulated command takes, to model spawn/ssh cost (default: 0).")
+    parser.add_argument('--json', default=None, help="Write every run to this file.")
+    args = parser.parse_args()
+
+    methodologies = ["SPECTRA", "IBM"] if args.methodology == "both" else [args.methodology.upper()]
+    runs = [
+        discover(LibrarySimulator(drives, args.partitions, methodology, args.latency))
+        for methodology in methodologies
+        for drives in args.drives
+    ]
+    print_summary(runs)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(runs, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
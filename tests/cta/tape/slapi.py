@@ -0,0 +1,173 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class SlapiTable:
+    """Single-pass parser for SLAPI list output.
+
+    Every line is tokenized once into a record and filed under each of the table's
+    index keys, so later lookups are dictionary hits instead of rescans of the output.
+    Output can be given whole to parse(), or fed in chunks with feed() and close().
+    """
+
+    # SLAPI prints a banner and column headers before the first data row
+    header_lines = 5
+    keys: List[str] = []
+
+    def __init__(self) -> None:
+        self.rows: List[Dict[str, Any]] = []
+        self.index: Dict[str, Dict[str, List[Dict[str, Any]]]] = {key: {} for key in self.keys}
+        self._pending = ""
+        self._line_number = 0
+
+    @classmethod
+    def parse(cls, output: Optional[str]) -> "SlapiTable":
+        table = cls()
+        table.feed(output or "")
+        table.close()
+        return table
+
+    def feed(self, chunk: str) -> None:
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._add_line(line)
+
+    def close(self) -> None:
+        if self._pending:
+            self._add_line(self._pending)
+            self._pending = ""
+
+    def _add_line(self, line: str) -> None:
+        self._line_number += 1
+        if self._line_number <= self.header_lines:
+            self.parse_header(line)
+            return
+        if not line.strip():
+            return
+        row = self.parse_row(line)
+        if row is None:
+            return
+        self.rows.append(row)
+        for key in self.keys:
+            for value in self.index_values(key, row):
+                self.index[key].setdefault(value, []).append(row)
+
+    def parse_header(self, line: str) -> None:
+        pass
+
+    def parse_row(self, line: str) -> Optional[Dict[str, Any]]:
+        return {"parts": line.split()}
+
+    def index_values(self, key: str, row: Dict[str, Any]) -> Iterable[str]:
+        value = row.get(key)
+        return [value] if value is not None else []
+
+    def find(self, key: str, value: str) -> List[Dict[str, Any]]:
+        return self.index[key].get(value, [])
+
+    def get(self, key: str, value: str) -> Optional[Dict[str, Any]]:
+        """Returns the last row filed under value, matching how the old line scans overwrote earlier hits"""
+        rows = self.find(key, value)
+        return rows[-1] if rows else None
+
+
+class DriveList(SlapiTable):
+    """`slapi.py drivelist`, indexed by serial number, partition and partition drive number"""
+
+    keys = ["serial", "partition", "partDriveNumber"]
+    pattern = re.compile(
+        r'(\S+)\s+'            # ID (non-space characters, then spaces)
+        r'\S+\s+'              # DriveStatus (skip this field)
+        r'([^\d]+)\s+'         # Partition (non-digit characters, then spaces)
+        r'(\d+)\s+'            # PartDriveNum (digits, then spaces)
+    )
+    # What a drive serial looks like when the header doesn't name its column
+    serial_pattern = re.compile(r'^(?=.*\d)[0-9A-Z]{8,}$')
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Counted from the end of the row, since partition names may contain spaces
+        self._serial_column: Optional[int] = None
+
+    def parse_header(self, line: str) -> None:
+        columns = line.split()
+        for i, column in enumerate(columns):
+            if "serial" in column.lower():
+                self._serial_column = i - len(columns)
+
+    def parse_row(self, line: str) -> Optional[Dict[str, Any]]:
+        match = self.pattern.match(line)
+        if not match:
+            return None
+        id, partition, part_drive_num = match.groups()
+        parts = line.split()
+        return {
+            "id": id.strip(),
+            "partition": partition.strip(),
+            "partDriveNumber": part_drive_num.strip(),
+            "serial": self._serial(parts),
+            "parts": parts,
+        }
+
+    def _serial(self, parts: List[str]) -> Optional[str]:
+        if self._serial_column is not None and len(parts) >= -self._serial_column:
+            return parts[self._serial_column]
+        candidates = [part for part in parts[3:] if self.serial_pattern.match(part)]
+        return candidates[-1] if candidates else None
+
+    def index_values(self, key: str, row: Dict[str, Any]) -> Iterable[str]:
+        if key == "serial":
+            # Also filed without the leading zeros that sg_inq serials have stripped
+            serial = row["serial"]
+            return {value for value in (serial, serial.lstrip("0")) if value} if serial else []
+        return super().index_values(key, row)
+
+    def find(self, key: str, value: str) -> List[Dict[str, Any]]:
+        rows = super().find(key, value)
+        if not rows and key == "serial" and value:
+            # Serials written differently from the column (e.g. with a vendor prefix) are still found in the line
+            rows = [row for row in self.rows if value in " ".join(row["parts"])]
+        return rows
+
+
+class InventoryList(SlapiTable):
+    """`slapi.py inventorylist`, drive rows indexed by partition drive number"""
+
+    keys = ["drive"]
+
+    def parse_row(self, line: str) -> Optional[Dict[str, Any]]:
+        parts = line.split()
+        if len(parts) < 4:
+            return None
+        return {
+            "partition": parts[0],
+            "type": parts[1],
+            "elementAddress": parts[2],
+            "number": parts[3],
+            "parts": parts,
+        }
+
+    def index_values(self, key: str, row: Dict[str, Any]) -> Iterable[str]:
+        if key == "drive" and row["type"] == "drive":
+            return [f"{row['partition']}:{row['number']}"]
+        return []
+
+    def locations(self, partition: str) -> Dict[str, str]:
+        """Returns {partition drive number: element address} for a partition"""
+        prefix = f"{partition}:"
+        return {
+            value[len(prefix):]: rows[-1]["elementAddress"]
+            for value, rows in self.index["drive"].items()
+            if value.startswith(prefix)
+        }
+
+
+class LibrarySettingsList(SlapiTable):
+    """`slapi.py librarysettingslist`; the library name is the first field of the last row"""
+
+    header_lines = 0
+
+    @property
+    def library_name(self) -> Optional[str]:
+        return self.rows[-1]["parts"][0] if self.rows else None
@@ -1,81 +1,116 @@
 import configparser
+import functools
 import json
+import shlex
 import subprocess
-import re
 
-from config import SPECTRA_CONFIG as _SPECTRA_CONFIG
+from config import CACHE_DIR as _CACHE_DIR, SPECTRA_CONFIG as _SPECTRA_CONFIG
+from models.cache import TTLCache
+from models.globals import printv
+from models.helpers import SSH_POOL
+from models.recorder import RECORDER
+from models.tracing import TRACER
+from .slapi import DriveList, InventoryList, LibrarySettingsList
 
-_config = configparser.ConfigParser()
-_config.read(_SPECTRA_CONFIG)
+@functools.lru_cache(maxsize=None)
+def _settings():
+    """Reads spectra.ini on first use rather than at import"""
+    config = configparser.ConfigParser()
+    config.read(_SPECTRA_CONFIG)
+    return config
 
-_host = '%s@%s' % (
-    _config.get("ssa", "user"),
-    _config.get("ssa", "host")
-)
-_slapi_cmd = "python3 ~/scripts/slapi.py --insecure --server %s --user %s --insecure-passwd %s" % (
-    _config.get("slapi", "server"),
-    _config.get("slapi", "user"),
-    _config.get("slapi", "password")
-)
+def _host():
+    return '%s@%s' % (
+        _settings().get("ssa", "user"),
+        _settings().get("ssa", "host")
+    )
+
+def _slapi_cmd():
+    return "python3 ~/scripts/slapi.py --insecure --server %s --user %s --insecure-passwd %s" % (
+        _settings().get("slapi", "server"),
+        _settings().get("slapi", "user"),
+        _settings().get("slapi", "password")
+    )
+
+@functools.lru_cache(maxsize=None)
+def _cache():
+    # Library topology rarely changes, so SLAPI answers are reused for [cache] ttl seconds (default: one day)
+    return TTLCache("spectra", _settings().getfloat("cache", "ttl", fallback=86400), directory=_CACHE_DIR)
+
+def _cache_key(partition):
+    return f"{_settings().get('slapi', 'server')}:{partition}"
 
 def _slapi_call(method, *args):
-    cmd = f"{_slapi_cmd} {method}"
+    cmd = f"{_slapi_cmd()} {method}"
     if args:
         for arg in args:
             cmd += f" {arg}"
     return cmd
 
 def ssh_command_with_kerberos(command):
-    try:
+    def execute():
         result = subprocess.run(
-            ["ssh", "-K", f"{_host}", command],
-            check=True,
+            ["ssh", "-K", *shlex.split(SSH_POOL.options(_host())), _host(), command],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True
         )
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        return f"Command failed: {e.stderr}"
+        return {"stdout": result.stdout, "stderr": result.stderr, "returncode": result.returncode}
     
-def get_library_name():
-    command = _slapi_call("librarysettingslist")
-    output = ssh_command_with_kerberos(command)
-    lines = output.strip().split('\n')
-    data_line = lines[-1]
-    parts = data_line.split()
-    library_name = parts[0]
-    return library_name
-
-def get_location(partition="zzCTA"):
-    command = _slapi_call("inventorylist", "zzCTA")
-    output = ssh_command_with_kerberos(command)
-    lines = output.split('\n')
-    retval = {}
-    for line in lines[5:]:
-        if line.strip():
-            parts = line.split()
-            if parts[0] == partition and parts[1] == "drive":
-                retval[parts[3]] = parts[2]
-    return retval
+    # Fixtures must not carry the SLAPI password
+    password = _settings().get("slapi", "password", fallback=None)
+    recorded = command.replace(password, "<password>") if password else command
+    with TRACER.span("ssh", "command", node="ssa", command=recorded):
+        result = RECORDER.intercept("ssh", recorded, execute)
+    if result["returncode"]:
+        return f"Command failed: {result['stderr']}"
+    return result["stdout"]
+    
+def ssh_batch_with_kerberos(commands):
+    """Runs several commands concurrently in one ssh session.
+
+    Each command's output and exit status are written to their own files on the remote
+    side, since the batch shell itself always exits 0.
+
+    Returns:
+        list: (returncode, stdout) of each command, in the order given. If the session itself
+        fails, every command gets returncode 255 and the failure message.
+    """
+    marker = "@@SDS-BATCH-OUTPUT@@"
+    background = " ".join(f"{{ ({command}) > $d/{i}; echo $? > $d/{i}.rc; }} &" for i, command in enumerate(commands))
+    collect = "; ".join(f'echo "{marker}"; cat $d/{i}.rc $d/{i}' for i in range(len(commands)))
+    output = ssh_command_with_kerberos(f'd=$(mktemp -d); {background} wait; {collect}; rm -rf "$d"')
+    if marker not in output:
+        return [(255, output)] * len(commands)
+    results = []
+    for section in output.split(f"{marker}\n")[1:]:
+        returncode, _, stdout = section.partition("\n")
+        results.append((int(returncode) if returncode.strip().isdigit() else 255, stdout))
+    return results
+    
+def get_library_name(output=None):
+    if output is None:
+        command = _slapi_call("librarysettingslist")
+        output = ssh_command_with_kerberos(command)
+    return LibrarySettingsList.parse(output).library_name
+
+def get_location(partition="zzCTA", output=None):
+    if output is None:
+        command = _slapi_call("inventorylist", partition)
+        output = ssh_command_with_kerberos(command)
+    return InventoryList.parse(output).locations(partition)
     
     
-def get_drive_info(library_name, serial_numbers):
+def get_drive_info(library_name, serial_numbers, output=None):
     if not isinstance(serial_numbers, list):
         serial_numbers = [serial_numbers]
     
-    command = _slapi_call("drivelist")
-    output = ssh_command_with_kerberos(command)
+    if output is None:
+        command = _slapi_call("drivelist")
+        output = ssh_command_with_kerberos(command)
     if not output:
         return None
     
-    pattern = re.compile(
-        r'(\S+)\s+'            # ID (non-space characters, then spaces)
-        r'\S+\s+'              # DriveStatus (skip this field)
-        r'([^\d]+)\s+'         # Partition (non-digit characters, then spaces)
-        r'(\d+)\s+'            # PartDriveNum (digits, then spaces)
-    )
-    
     def get_drive_name(input_id): # Convert full Drive ID to our preferred naming convention
         segments = input_id.split("/")
         result = ""
@@ -83,42 +118,63 @@ def get_drive_info(library_name, serial_numbers):
             result += segment.replace("FR", "F").replace("DBA", "B").replace("fLTO-DRV", "D")
         return f"{library_name}_{result}"
     
-    lines = output.split('\n')
+    drive_list = DriveList.parse(output)
     retval = {}
-    for line in lines[5:]: 
-        if line.strip():  # Skip empty lines
-            # Use the regex to find all matches
-            for sn in serial_numbers:
-                if sn in line:
-                    serial_num = sn
-                    match = pattern.match(line)
-                    if match:
-                        id, partition, part_drive_num = match.groups()
-                        if serial_num in serial_numbers:
-                            retval[serial_num] = {
-                            "id": id.strip(),
-                            "driveName": get_drive_name(id.strip()),
-                            "partition": partition.strip(),
-                            "partDriveNumber": part_drive_num.strip()
-                        }
+    for serial_num in serial_numbers:
+        row = drive_list.get("serial", serial_num)
+        if row:
+            retval[serial_num] = {
+                "id": row["id"],
+                "driveName": get_drive_name(row["id"]),
+                "partition": row["partition"],
+                "partDriveNumber": row["partDriveNumber"]
+            }
                 
     if retval:
         return retval
     return None
 
-def get_device_info(serial_numbers=None, debug=False):
+def invalidate_cache(partition="zzCTA"):
+    _cache().invalidate(_cache_key(partition))
+
+def get_library_tables(partition="zzCTA", refresh=False):
+    """Returns the librarysettingslist, drivelist and inventorylist outputs for a partition.
+
+    Answers are served from the on-disk cache unless they have expired or refresh is set.
+    """
+    key = _cache_key(partition)
+    tables = None if refresh else _cache().get(key)
+    if tables is None:
+        # All three SLAPI queries run at once over a single ssh session
+        names = ["librarysettingslist", "drivelist", "inventorylist"]
+        results = ssh_batch_with_kerberos([
+            _slapi_call("librarysettingslist"),
+            _slapi_call("drivelist"),
+            _slapi_call("inventorylist", partition),
+        ])
+        tables = {name: output for name, (_, output) in zip(names, results)}
+        # A failed or empty table must not be served for a whole TTL
+        failed = [name for name, (returncode, output) in zip(names, results) if returncode or not output.strip()]
+        if failed:
+            printv(f"Not caching SLAPI tables for {partition}, failed or empty: {', '.join(failed)}")
+        else:
+            _cache().set(key, tables)
+    return tables
+
+def get_device_info(serial_numbers=None, debug=False, refresh=False):
     print(
         f"""
                             Using SPECTRA method to get drive details
-        (This method takes a little bit longer, please wait while we communicate with ssasrv nodes)
+        (Please wait while we communicate with ssasrv nodes)
         """)
     assert serial_numbers, "No serial numbers to validate"
 
-    LibraryName = get_library_name()
+    tables = get_library_tables(refresh=refresh)
+    LibraryName = get_library_name(tables["librarysettingslist"])
     libraryName = LibraryName[-2:].split("_")[0].upper() if LibraryName else None
-    drives = get_drive_info(libraryName, serial_numbers)
+    drives = get_drive_info(libraryName, serial_numbers, tables["drivelist"])
     drives["LogicalLibrary"] = LibraryName
-    locations = get_location()
+    locations = get_location(output=tables["inventorylist"])
 
     for sn in serial_numbers:
         if sn in drives:
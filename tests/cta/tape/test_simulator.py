@@ -0,0 +1,32 @@
+import pytest
+
+from tests.cta.tape import spectra
+from tests.cta.tape.simulator import LibrarySimulator, discover
+
+
+@pytest.mark.parametrize("methodology", ["SPECTRA", "IBM"])
+def test_discovery_finds_every_drive(methodology):
+    run = discover(LibrarySimulator(drives=200, partitions=1, methodology=methodology))
+    assert run["discovered"] == 200
+
+
+@pytest.mark.parametrize("methodology", ["SPECTRA", "IBM"])
+def test_discovery_spawns_do_not_grow_with_drives(methodology):
+    small = discover(LibrarySimulator(drives=24, partitions=2, methodology=methodology))
+    large = discover(LibrarySimulator(drives=200, partitions=2, methodology=methodology))
+    assert large["spawns_by_kind"] == small["spawns_by_kind"]
+
+
+def test_failed_slapi_table_is_not_cached(cache_dir):
+    simulator = LibrarySimulator(drives=4)
+    simulator.failing = {"drivelist"}
+    with simulator.simulate():
+        spectra._cache().ttl = 86400
+        tables = spectra.get_library_tables()
+        assert tables["drivelist"] == "" and tables["librarysettingslist"]
+        assert spectra._cache().get(spectra._cache_key("zzCTA")) is None
+
+        simulator.failing = set()
+        spectra.get_library_tables()
+        assert spectra._cache().get(spectra._cache_key("zzCTA"))["drivelist"]
+        assert spectra._cache().directory.startswith(str(cache_dir))
@@ -0,0 +1,21 @@
+from tests.cta.tape.slapi import DriveList
+
+HEADER = "SLAPI drivelist\n\n----\nID  DriveStatus  Partition  PartDriveNum  Type  SerialNumber\n----\n"
+ROWS = "FR1/DBA1/fLTO-DRV1  Ready  zz CTA  1  LTO-8  0078000001\nFR1/DBA1/fLTO-DRV2  Ready  zz CTA  2  LTO-8  0078000002\n"
+
+
+def test_only_the_serial_column_is_indexed():
+    drives = DriveList.parse(HEADER + ROWS)
+    assert set(drives.index["serial"]) == {"0078000001", "78000001", "0078000002", "78000002"}
+    assert drives.get("serial", "78000002")["partDriveNumber"] == "2"
+
+
+def test_serial_column_detected_by_pattern_without_header():
+    drives = DriveList.parse("\n" * 5 + ROWS)
+    assert set(drives.index["serial"]) == {"0078000001", "78000001", "0078000002", "78000002"}
+
+
+def test_unindexed_serials_fall_back_to_a_line_search():
+    drives = DriveList.parse(HEADER + ROWS.replace("0078000002", "IBM0078000002"))
+    assert drives.get("serial", "78000002")["partDriveNumber"] == "2"
+    assert drives.get("serial", "99999999") is None
@@ -1,39 +1,90 @@
 #!/usr/bin/env python3
 
+import asyncio
+import difflib
+import functools
 import os
+import stat
 import subprocess
 import json
 import argparse
+import tempfile
+import time
 from models.globals import verbose, printv
+from models.async_runner import run_shell
+from models.metrics import METRICS
+from models.tracing import TRACER
+from models.recorder import RECORDER
+from tests import load_plugin
 
-from tape.ibm import get_device_info as get_device_info_ibm
-from tape.spectra import get_device_info as get_device_info_spectra
+_DISCOVERY_SECONDS = METRICS.histogram("sds_tape_discovery_seconds", "Wall time of tape drive discovery (TapeInfo.get_data).", ["methodology"])
+_DRIVES_DISCOVERED = METRICS.gauge("sds_tape_drives_discovered", "Drives with full details found by the last discovery.", ["methodology"])
 
 class TapeInfo:
-    def __init__(self):
+    def __init__(self, refresh=False):
         global verbose
         self.verbose = "-v" if verbose else str()
+        self.debug = False
+        self.refresh = refresh
         self.methodology = None
         self.devices = {
             "tape": [],
             "mediumx":[]
         }
+        self.sg_map = None
+        self.drive_ordinals = None
 
     def run_command(self, command, timeout=60):
         printv(f"\nRunning Command: {command}")
+        
+        def execute():
+            result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout)
+            return {"stdout": result.stdout, "stderr": result.stderr, "returncode": result.returncode}
+        
         try:
-            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout)
-            response = result.stdout.strip()
+            with TRACER.span("subprocess", "command", command=command):
+                result = RECORDER.intercept("tape_info", command, execute)
+            if result["returncode"]:
+                print(f"An error occurred: Command '{command}' returned non-zero exit status {result['returncode']}.")
+                return None
+            response = result["stdout"].strip()
             printv(f"Command Response: {response}")
             return response
         except subprocess.TimeoutExpired:
             print("The command did not complete within the timeout period")
         except Exception as e:
             print(f"An error occurred: {e}")
+
+    async def arun_command(self, command, timeout=60, semaphore=None):
+        printv(f"\nRunning Command: {command}")
+        
+        async def execute():
+            returncode, stdout, stderr = await run_shell(command, timeout, semaphore)
+            return {"stdout": stdout, "stderr": stderr, "returncode": returncode}
+        
+        try:
+            with TRACER.span("subprocess", "command", f"task-{id(asyncio.current_task())}", command=command):
+                result = await RECORDER.aintercept("tape_info", command, execute)
+            if result["returncode"]:
+                print(f"An error occurred: Command '{command}' returned non-zero exit status {result['returncode']}.")
+                return None
+            response = result["stdout"].strip()
+            printv(f"Command Response: {response}")
+            return response
+        except asyncio.TimeoutError:
+            print("The command did not complete within the timeout period")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+
+    async def arun_commands(self, commands, timeout=60, limit=16):
+        """Runs many commands at once, at most `limit` at a time, returning responses in order"""
+        semaphore = asyncio.Semaphore(limit)
+        return await asyncio.gather(*(self.arun_command(command, timeout, semaphore) for command in commands))
         
 
     def get_devices(self):
         all_devices =  self.run_command(f"/usr/bin/lsscsi -g").split("\n")
+        found = []
         for line in all_devices:
             if line.strip():
                 info = line.split()
@@ -43,22 +94,84 @@ class TapeInfo:
                     if self.methodology and self.methodology != info[2]:
                         print(f"Multiple mediumx types present: {self.methodology} | {info[2]}")
                     self.methodology = info[2]
-                    details = {
-                        "serial_num": self.get_serial_number(info[-1]).lstrip('0'),
-                        "drive_device": info[-1] 
-                    }
+                    drive_device = info[-1]
                 else:
-                    details = {
-                        "serial_num": self.get_serial_number(info[-1]).lstrip('0'),
-                        "drive_device": info[-2] if self.methodology == "SPECTRA" else info[-1]
-                    }  
-                self.devices[info[1]].append(details)
+                    drive_device = info[-2] if self.methodology == "SPECTRA" else info[-1]
+                found.append((info[1], info[-1], drive_device))
+        
+        serial_numbers = self.get_serial_numbers([generic for _, generic, _ in found])
+        for device_type, generic, drive_device in found:
+            details = {
+                "serial_num": serial_numbers.get(generic, "").lstrip('0'),
+                "drive_device": drive_device
+            }
+            self.devices[device_type].append(details)
         print(json.dumps(self.devices, indent=4))
         #return self.run_command(f"/usr/bin/lsscsi -g {self.verbose} | /usr/bin/grep ' {device_type} ' | /usr/bin/awk '{{print $7}}'").splitlines()
 
-    def get_serial_number(self, device):
-        printv(f"\nGeting Serial Number for device: {device}")
-        return self.run_command(f"/usr/bin/sg_inq {self.verbose} {device} | /usr/bin/grep 'Unit serial number: ' | sed 's/Unit serial number: //'")
+    def get_serial_numbers(self, devices, timeout=10):
+        """Inquires every device's serial number in one shell, all devices at once.
+
+        Each sg_inq runs in the background under its own timeout, so a busy drive only
+        costs its own slot. Returns {device: serial}; timed-out devices map to "".
+        """
+        if not devices:
+            return {}
+        printv(f"\nGetting Serial Numbers for devices: {' '.join(devices)}")
+        serial_numbers = {device: "" for device in devices}
+        for line in (self.run_command(self.serial_number_inquiry(devices, timeout), timeout + 5) or "").split("\n"):
+            parts = line.split(maxsplit=1)
+            if parts and parts[0] in serial_numbers:
+                serial_numbers[parts[0]] = parts[1].strip() if len(parts) > 1 else ""
+        for device, serial_num in serial_numbers.items():
+            if not serial_num:
+                print(f"Failed to fetch serial number for device: {device}")
+        return serial_numbers
+
+    def serial_number_inquiry(self, devices, timeout=10):
+        """The shell command get_serial_numbers runs; prints "DEVICE SERIAL" per device"""
+        return (
+            f"for dev in {' '.join(devices)}; do "
+            f"(sn=$(/usr/bin/timeout {timeout} /usr/bin/sg_inq {self.verbose} $dev 2>/dev/null "
+            f"| sed -n 's/.*Unit serial number: //p'); echo \"$dev $sn\") & "
+            f"done; wait"
+        )
+
+    def load_tables(self):
+        """Snapshots `sg_map` and `cta-smc -q D` once and indexes them for per-drive lookups.
+
+        sg_map is indexed by every device path on a line (the value is the line's second column),
+        cta-smc by drive element address (the value is the drive ordinal).
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        printv("\nLoading sg_map and cta-smc drive tables")
+        # Threads rather than asyncio.run, so discovery also works when called from a running event loop
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            sg_map = pool.submit(self.run_command, "/usr/bin/sg_map")
+            smc_drives = pool.submit(self.run_command, "cta-smc -q D", 5)
+            sg_map, smc_drives = sg_map.result(), smc_drives.result()
+        self.sg_map = {}
+        for line in (sg_map or "").split("\n"):
+            parts = line.split()
+            if len(parts) > 1:
+                for path in parts:
+                    self.sg_map[path] = parts[1]
+        self.drive_ordinals = {}
+        for line in (smc_drives or "").split("\n"):
+            parts = line.split()
+            if len(parts) > 1:
+                self.drive_ordinals[parts[1]] = parts[0]
+
+    def get_drive_device(self, device):
+        if self.sg_map is None:
+            self.load_tables()
+        return self.sg_map.get(device)
+
+    def get_drive_ordinal(self, element_address):
+        if self.drive_ordinals is None:
+            self.load_tables()
+        return self.drive_ordinals.get(str(element_address))
 
     def get_device_name(self, logical_library, location):
         printv(f"\nGenerating Device Name | logical_library: {logical_library} | location: {location}")
@@ -78,52 +191,121 @@ class TapeInfo:
         return filename
 
 
+    @TRACER.traced("TapeInfo.get_data")
     def get_data(self):
         printv("Get Data | Begin")
+        start = time.monotonic()
         self.get_devices()
         if self.methodology == "IBM":
-            data = get_device_info_ibm(self, self.devices)
+            data = load_plugin("cta", "tape", "ibm").get_device_info(self, self.devices)
         elif self.methodology == "SPECTRA":
             serial_numbers = [device["serial_num"] for device in self.devices["tape"]]
-            data = get_device_info_spectra(serial_numbers)
+            data = load_plugin("cta", "tape", "spectra").get_device_info(serial_numbers, refresh=self.refresh)
         else:
             data = {}
-            
+        
+        methodology = self.methodology or "none"
+        _DISCOVERY_SECONDS.observe(time.monotonic() - start, methodology=methodology)
+        _DRIVES_DISCOVERED.set(sum(isinstance(value, dict) for value in (data or {}).values()), methodology=methodology)
         return data
 
-    def generate_config_files(self, data, output_dir):
-        config_file_template = open("config/templates/cta-taped_config.template", "r").read()
-        sysconfig_file_template = open("config/templates/cta-taped_sysconfig.template", "r").read()
-        os.makedirs(f"{output_dir}/sysconfig", exist_ok=True)
-        os.makedirs(f"{output_dir}/cta", exist_ok=True)
+    def render_config_files(self, data, output_dir):
+        """Returns {path: content} for every sysconfig and cta-taped config file that data describes"""
+        config_file_template = _read_template("config/templates/cta-taped_config.template")
+        sysconfig_file_template = _read_template("config/templates/cta-taped_sysconfig.template")
+        rendered = {}
         for key, val in data.items():
             # sysconfig file = /etc/sysconfig/cta-taped_{DriveName}
             sysconfig_output_file = os.path.join(output_dir, f"sysconfig/cta-taped-{val['DriveName']}")
-            with open(sysconfig_output_file, 'w') as f:
-                if output_dir != '/etc':
-                    f.write(f"# To Install, place this file in /etc/sysconfig/cta-taped-{val['DriveName']}\n\n")
-                f.write(sysconfig_file_template)
-                f.write('\nCTA_TAPED_OPTIONS="--config=/etc/cta/cta-taped-%s.conf"' % val['DriveName'])
-                f.close()
-            os.system(f"chown -R -L root:root {sysconfig_output_file}")
-            os.system(f"chmod 0644 {sysconfig_output_file}")
-                
+            content = []
+            if output_dir != '/etc':
+                content.append(f"# To Install, place this file in /etc/sysconfig/cta-taped-{val['DriveName']}\n\n")
+            content.append(sysconfig_file_template)
+            content.append('\nCTA_TAPED_OPTIONS="--config=/etc/cta/cta-taped-%s.conf"' % val['DriveName'])
+            rendered[sysconfig_output_file] = "".join(content)
                 
             # cta config file = /etc/cta/cta-taped_{DriveName}.conf
             cta_config_output_file = os.path.join(output_dir, f"cta/cta-taped-{val['DriveName']}.conf")
-            with open(cta_config_output_file, 'w') as f:
-                if output_dir != '/etc':
-                    f.write(f"# To Install, place this file in /etc/cta/cta-taped-{val['DriveName']}.conf\n\n")
-                f.write(config_file_template)
-                f.write('# Tape Drive Details\n')
-                for k, v in val.items():
-                    f.write(f"taped {k} {v}\n")
-                f.close()
-            os.system(f"chown -R -L root:root {cta_config_output_file}")
-            os.system(f"chmod 0644 {cta_config_output_file}")
-
-def get_tape_info():
-    tape_info = TapeInfo()
+            content = []
+            if output_dir != '/etc':
+                content.append(f"# To Install, place this file in /etc/cta/cta-taped-{val['DriveName']}.conf\n\n")
+            content.append(config_file_template)
+            content.append('# Tape Drive Details\n')
+            for k, v in val.items():
+                content.append(f"taped {k} {v}\n")
+            rendered[cta_config_output_file] = "".join(content)
+        return rendered
+
+    def generate_config_files(self, data, output_dir):
+        """Writes the config files for data, touching only the ones whose content changed.
+
+        Changed files are written to a temporary file in the same directory, given root:root
+        ownership and mode 0644, then renamed into place, so running taped daemons never
+        read a half-written file.
+
+        Returns:
+            dict: {path: "created" | "updated (+added -removed)" | "unchanged"}
+        """
+        os.makedirs(f"{output_dir}/sysconfig", exist_ok=True)
+        os.makedirs(f"{output_dir}/cta", exist_ok=True)
+        summary = {}
+        for path, content in self.render_config_files(data, output_dir).items():
+            try:
+                with open(path, "r") as f:
+                    current = f.read()
+            except FileNotFoundError:
+                current = None
+            if current == content:
+                _set_owner_and_mode(path)
+                summary[path] = "unchanged"
+                continue
+            directory = os.path.dirname(path)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(content)
+                _set_owner_and_mode(tmp_path)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            if current is None:
+                summary[path] = "created"
+            else:
+                diff = list(difflib.unified_diff(current.splitlines(), content.splitlines(), path, path, lineterm=""))
+                added = sum(1 for line in diff if line.startswith("+") and not line.startswith("+++"))
+                removed = sum(1 for line in diff if line.startswith("-") and not line.startswith("---"))
+                summary[path] = f"updated (+{added} -{removed})"
+                printv("\n".join(diff))
+        
+        for status in ["created", "updated", "unchanged"]:
+            paths = [path for path, result in summary.items() if result.startswith(status)]
+            print(f"Config files {status}: {len(paths)}")
+            if status != "unchanged":
+                for path in paths:
+                    print(f"    {path}: {summary[path]}")
+        return summary
+
+
+@functools.lru_cache(maxsize=None)
+def _read_template(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _set_owner_and_mode(path):
+    current = os.stat(path)
+    if stat.S_IMODE(current.st_mode) != 0o644:
+        os.chmod(path, 0o644)
+    if (current.st_uid, current.st_gid) != (0, 0):
+        try:
+            os.chown(path, 0, 0)
+        except PermissionError:
+            printv(f"Could not set root:root ownership on {path}, run as root to install into /etc")
+
+def get_tape_info(refresh=False):
+    tape_info = TapeInfo(refresh)
     data = tape_info.get_data()
     assert tape_info.devices and data, "Could not get tape info. Exiting"
         
@@ -134,14 +316,14 @@ def get_tape_info():
                 tape_item = data[device["serial_num"]]
                 device["DriveLogicalLibrary"] = logicalLibrary
                 device["DriveName"] = tape_item.get("driveName")
-                tape_drive_device = tape_info.run_command(f"/usr/bin/sg_map | /usr/bin/grep {device['drive_device']} | /usr/bin/awk '{{print $2}}'")
+                tape_drive_device = tape_info.get_drive_device(device['drive_device'])
                 if not tape_drive_device:
                     print(f"Failed to fetch DriveDevice for tape device: {device['serial_num']}")
                 else:
                     device["DriveDevice"] = tape_drive_device
                 elementAddress = tape_item.get("elementAddress", None)
                 if elementAddress:
-                    ordinal = tape_info.run_command(f"cta-smc -q D | awk -v addr='{elementAddress}' '{{if ($2 == addr) print $1}}'", 5)
+                    ordinal = tape_info.get_drive_ordinal(elementAddress)
                     if ordinal:
                         device["DriveControlPath"] = f"smc{ordinal}"
                     else:
@@ -150,4 +332,9 @@ def get_tape_info():
     
     return json.dumps(data, indent=4)
 
-        
\ No newline at end of file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Discover tape drive details for cta-taped configuration")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached library topology and query the library again.")
+    args = parser.parse_args()
+    print(get_tape_info(refresh=args.refresh))
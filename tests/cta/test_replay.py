@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from models.helpers import Runner
+from models.recorder import RECORDER
+from models.settings import Configuration
+from tests.cta.tape_info import TapeInfo
+
+LSSCSI = (
+    "[0:0:0:0]  mediumx  IBM  03584L22  F030  -         /dev/sg0\n"
+    "[0:0:1:0]  tape     IBM  ULT3580   J4D0  /dev/st0  /dev/sg1\n"
+)
+
+
+@pytest.fixture
+def recorder():
+    yield RECORDER
+    RECORDER.mode, RECORDER.path, RECORDER.responder, RECORDER.commands = None, None, None, []
+
+
+def test_runner_record_then_replay(recorder, tmp_path):
+    fixtures = str(tmp_path / "fixtures.json")
+    recorder.start("record", fixtures)
+    runner = Runner(Configuration(service="cta"))
+    runner.add_commands(["echo recorded", "echo to-stderr >&2"])
+    recorded = runner.run()
+    recorder.dump()
+
+    recorder.commands = []
+    recorder.start("replay", fixtures)
+    runner = Runner(Configuration(service="cta"))
+    runner.add_commands(["echo recorded", "echo to-stderr >&2"])
+    assert runner.run() == recorded
+    assert runner.returncode == 0
+
+
+def test_discovery_replays_without_hardware(recorder, tmp_path):
+    fixtures = tmp_path / "fixtures.json"
+    tape_info = TapeInfo()
+    inquiry = tape_info.serial_number_inquiry(["/dev/sg0", "/dev/sg1"])
+    commands = [
+        {"kind": "tape_info", "command": "/usr/bin/lsscsi -g", "stdout": LSSCSI, "stderr": "", "returncode": 0},
+        {"kind": "tape_info", "command": inquiry, "stdout": "/dev/sg0 0000013100123\n/dev/sg1 0000078000456\n", "stderr": "", "returncode": 0},
+        {"kind": "tape_info", "command": "/usr/bin/sg_map", "stdout": "/dev/sg1  /dev/st0\n", "stderr": "", "returncode": 0},
+        {"kind": "tape_info", "command": "cta-smc -q D", "stdout": "0  257  free\n", "stderr": "", "returncode": 0},
+    ]
+    fixtures.write_text(json.dumps({"version": 1, "commands": commands}))
+    recorder.start("replay", str(fixtures))
+    tape_info.get_devices()
+    assert tape_info.methodology == "IBM"
+    assert tape_info.devices["tape"] == [{"serial_num": "78000456", "drive_device": "/dev/sg1"}]
+    assert tape_info.get_drive_device("/dev/sg1") == "/dev/st0"
+    assert tape_info.get_drive_ordinal(257) == "0"
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Concurrent encp workload driver.
+
+Generalizes sashas_test.sh: instead of one serial encp test script against a fixed
+directory, it runs a configurable number of concurrent encp transfers with a chosen
+file-size distribution and read/write mix, and reports per-transfer latency and
+aggregate throughput for each concurrency level. Any binary with encp's
+`encp SOURCE DESTINATION` calling convention can be used, e.g. --encp cp for CI.
+
+Run from the repository root:
+    python -m tests.enstore.scripts.encp_load --pnfs-dir /pnfs/fs/usr/data/$USER -c 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from tests.enstore.scripts.mover_benchmark import MB, percentile
+
+_UNITS = {"": 1, "K": 1024, "M": MB, "G": 1024 * MB}
+# uniform: sizes are drawn from this many evenly spaced values, so the source files
+# generated for writes stay a small, bounded set however wide the range is
+_UNIFORM_STEPS = 16
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1] if text and text[-1] in _UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+
+
+class SizeDistribution:
+    """File sizes drawn from fixed:SIZE, uniform:MIN-MAX or choice:SIZE,SIZE,..."""
+
+    def __init__(self, spec: str, seed: int = 0) -> None:
+        self.spec = spec
+        self.kind, _, values = spec.partition(":")
+        self.random = random.Random(seed)
+        if self.kind == "fixed":
+            self.sizes = [parse_size(values)]
+        elif self.kind == "uniform":
+            low, _, high = values.partition("-")
+            self.sizes = [parse_size(low), parse_size(high)]
+        elif self.kind == "choice":
+            self.sizes = [parse_size(value) for value in values.split(",")]
+        else:
+            raise ValueError(f"Unknown size distribution '{spec}', expected fixed:, uniform: or choice:")
+
+        if self.kind == "uniform":
+            low, high = self.sizes
+            steps = min(_UNIFORM_STEPS, (high - low) // 1024 + 1) if high > low else 1
+            # Rounded to 1 KB; every sampled size is one of these values
+            self.sizes = sorted({(low + (high - low) * i // max(steps - 1, 1)) // 1024 * 1024 for i in range(steps)})
+
+    def sample(self) -> int:
+        return self.random.choice(self.sizes)
+
+
+class EncpLoad:
+    """Runs encp transfers at a given concurrency and records each one"""
+
+    def __init__(self, encp: str, pnfs_dir: str, local_dir: str, sizes: SizeDistribution, read_fraction: float) -> None:
+        self.encp = encp
+        self.pnfs_dir = pnfs_dir
+        self.local_dir = local_dir
+        self.sizes = sizes
+        self.read_fraction = read_fraction
+        self.random = random.Random(sizes.random.random())
+        self._sources: Dict[int, str] = {}
+        self._written: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def prepare(self) -> None:
+        """Writes one source file per size the distribution can produce, before any transfer starts"""
+        for size in self.sizes.sizes:
+            if size in self._sources:
+                continue
+            path = os.path.join(self.local_dir, f"source_{size}")
+            block = os.urandom(min(size, MB)) or b""
+            with open(path, "wb") as f:
+                remaining = size
+                while remaining > 0:
+                    remaining -= f.write(block[:remaining])
+            self._sources[size] = path
+
+    def _next_name(self) -> str:
+        with self._lock:
+            self._counter += 1
+            return f"encp_load_{os.getpid()}_{self._counter}"
+
+    def _plan(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._written and self.random.random() < self.read_fraction:
+                written = self.random.choice(self._written)
+                return {"operation": "read", "source": written["destination"], "bytes": written["bytes"]}
+        size = self.sizes.sample()
+        return {"operation": "write", "source": self._sources[size], "bytes": size}
+
+    def transfer(self) -> Dict[str, Any]:
+        record = self._plan()
+        name = self._next_name()
+        if record["operation"] == "write":
+            record["destination"] = os.path.join(self.pnfs_dir, name)
+        else:
+            record["destination"] = os.path.join(self.local_dir, name)
+        start = time.perf_counter()
+        result = subprocess.run(
+            [self.encp, record["source"], record["destination"]],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        record["latency_s"] = time.perf_counter() - start
+        record["exit_code"] = result.returncode
+        if result.returncode:
+            record["error"] = result.stderr.strip()[-500:]
+        elif record["operation"] == "write":
+            with self._lock:
+                self._written.append(record)
+        else:
+            os.remove(record["destination"])
+        return record
+
+    def run(self, concurrency: int, transfers: int) -> Dict[str, Any]:
+        self.prepare()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            records = list(pool.map(lambda _: self.transfer(), range(transfers)))
+        elapsed = time.perf_counter() - start
+        ok = [record for record in records if not record["exit_code"]]
+        latencies = [record["latency_s"] for record in ok]
+        moved = sum(record["bytes"] for record in ok)
+        return {
+            "concurrency": concurrency,
+            "transfers": len(records),
+            "failed": len(records) - len(ok),
+            "reads": sum(record["operation"] == "read" for record in records),
+            "writes": sum(record["operation"] == "write" for record in records),
+            "bytes": moved,
+            "elapsed_s": elapsed,
+            "throughput_mb_s": moved / MB / elapsed if elapsed else 0.0,
+            "latency_p50_s": percentile(latencies, 50),
+            "latency_p95_s": percentile(latencies, 95),
+            "latency_p99_s": percentile(latencies, 99),
+            "records": records,
+        }
+
+
+def print_summary(runs: List[Dict[str, Any]]) -> None:
+    print("\n****************************************************************************************")
+    print(f"{'concurrency':>12} {'transfers':>10} {'failed':>7} {'MB/s':>10} {'p50 s':>9} {'p95 s':>9} {'p99 s':>9}")
+    print("****************************************************************************************")
+    for run in runs:
+        print(
+            f"{run['concurrency']:>12} {run['transfers']:>10} {run['failed']:>7} {run['throughput_mb_s']:>10.1f} "
+            f"{run['latency_p50_s']:>9.3f} {run['latency_p95_s']:>9.3f} {run['latency_p99_s']:>9.3f}"
+        )
+    print("****************************************************************************************\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent encp load test")
+    parser.add_argument('--encp', default="encp", help="encp binary to run; any 'BIN SOURCE DEST' copier works as a stub (default: encp).")
+    parser.add_argument('--pnfs-dir', required=True, help="PNFS directory to write into; a timestamped subdirectory is created.")
+    parser.add_argument('--local-dir', default=None, help="Scratch directory for source files and read-backs (default: a temporary directory).")
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[1], help="Concurrent transfers; several values run a scaling sweep (default: 1).")
+    parser.add_argument('-t', '--transfers', type=int, default=20, help="Transfers per concurrency level (default: 20).")
+    parser.add_argument('--sizes', default="fixed:100M", help=f"fixed:SIZE, uniform:MIN-MAX ({_UNIFORM_STEPS} evenly spaced sizes) or choice:SIZE,... (default: fixed:100M).")
+    parser.add_argument('--read-fraction', type=float, default=0.0, help="Share of transfers that read back previously written files (default: 0).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for sizes and the read/write mix (default: 0).")
+    parser.add_argument('--json', default=None, help="Write every run, including per-transfer records, to this file.")
+    args = parser.parse_args()
+
+    pnfs_dir = os.path.join(args.pnfs_dir, f"encp_load-{time.strftime('%Y%m%d%H%M%S')}")
+    os.makedirs(pnfs_dir, exist_ok=True)
+    local_dir = args.local_dir or tempfile.mkdtemp(prefix="encp_load-")
+    os.makedirs(local_dir, exist_ok=True)
+    try:
+        load = EncpLoad(args.encp, pnfs_dir, local_dir, SizeDistribution(args.sizes, args.seed), args.read_fraction)
+        runs = [load.run(concurrency, args.transfers) for concurrency in args.concurrency]
+    finally:
+        if not args.local_dir:
+            shutil.rmtree(local_dir, ignore_errors=True)
+    print_summary(runs)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(runs, f, indent=4)
+    if any(run["failed"] for run in runs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Mover device throughput benchmark.
+
+Writes a volume of incompressible blocks to a tape drive and reads it back, timing
+every block. Run from the repository root:
+    python -m tests.enstore.scripts.mover_benchmark -d /dev/nst0 -m spectralogic
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import stat
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+from models.globals import printv
+
+MB = 1024 * 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of values (pct between 0 and 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class TapeDevice:
+    """Block I/O on a tape device node, or, when fake is set, on a regular file standing in for one"""
+
+    def __init__(self, path: str, fake: bool = False) -> None:
+        self.path = path
+        self.fake = fake
+        self.fd: Optional[int] = None
+
+    @property
+    def is_tape(self) -> bool:
+        return os.path.exists(self.path) and stat.S_ISCHR(os.stat(self.path).st_mode)
+
+    def open(self, mode: str) -> None:
+        flags = os.O_RDONLY if mode == "r" else os.O_WRONLY
+        if self.fake:
+            # Never truncate anything but a regular file, e.g. a disk given by mistake
+            if os.path.exists(self.path) and not stat.S_ISREG(os.stat(self.path).st_mode):
+                raise ValueError(f"{self.path} is not a regular file, refusing to use it as a fake tape")
+            if mode == "w":
+                flags |= os.O_CREAT | os.O_TRUNC
+        elif not self.is_tape:
+            raise ValueError(f"{self.path} is not a tape character device")
+        self.fd = os.open(self.path, flags, 0o644)
+
+    def rewind(self) -> None:
+        if self.is_tape:
+            subprocess.run(["mt", "-f", self.path, "rewind"], check=True)
+        elif self.fd is not None:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+
+    def write(self, block: bytes) -> int:
+        return os.write(self.fd, block)
+
+    def read(self, size: int) -> bytes:
+        return os.read(self.fd, size)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            if not self.is_tape:
+                os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+
+class BenchmarkResult:
+    """Throughput and latency figures for one pass over a mover device"""
+
+    def __init__(self, operation: str, mover: str, block_size: int) -> None:
+        self.operation = operation
+        self.mover = mover
+        self.block_size = block_size
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.first_byte: Optional[float] = None
+        self.latencies: List[float] = []
+        self.checksum: Optional[str] = None
+
+    @property
+    def throughput(self) -> float:
+        """MB/s over the whole pass, including open/rewind/close"""
+        return self.bytes / MB / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "operation": self.operation,
+            "mover": self.mover,
+            "block_size": self.block_size,
+            "bytes": self.bytes,
+            "elapsed_s": self.elapsed,
+            "throughput_mb_s": self.throughput,
+            "time_to_first_byte_s": self.first_byte,
+            "block_latency_p50_s": percentile(self.latencies, 50),
+            "block_latency_p95_s": percentile(self.latencies, 95),
+            "block_latency_p99_s": percentile(self.latencies, 99),
+        }
+
+    def get(self) -> str:
+        return f"""
+****************************************************
+     {self.operation.upper()} benchmark: {self.mover}
+****************************************************
+             volume:  {self.bytes / MB:.1f} MB ({len(self.latencies)} x {self.block_size // 1024} KB blocks)
+         throughput:  {self.throughput:.1f} MB/s
+ time to first byte:  {(self.first_byte or 0) * 1000:.2f} ms
+  block latency p50:  {percentile(self.latencies, 50) * 1000:.3f} ms
+  block latency p95:  {percentile(self.latencies, 95) * 1000:.3f} ms
+  block latency p99:  {percentile(self.latencies, 99) * 1000:.3f} ms
+****************************************************
+"""
+
+
+class MoverBenchmark:
+    """Writes and reads a volume through a mover device, timing every block"""
+
+    def __init__(self, device: str, mover: str = "fake", block_size: int = 256 * 1024, fake: bool = False) -> None:
+        self.device = TapeDevice(device, fake)
+        self.mover = mover
+        self.block_size = block_size
+
+    def _pattern(self) -> bytes:
+        # Incompressible so drive compression doesn't inflate the numbers
+        return os.urandom(self.block_size)
+
+    def write(self, volume: int) -> BenchmarkResult:
+        """Writes volume bytes from the start of the device"""
+        result = BenchmarkResult("write", self.mover, self.block_size)
+        block = self._pattern()
+        digest = hashlib.sha1()
+        start = time.perf_counter()
+        self.device.open("w")
+        try:
+            self.device.rewind()
+            while result.bytes < volume:
+                chunk = block[:min(self.block_size, volume - result.bytes)]
+                before = time.perf_counter()
+                written = self.device.write(chunk)
+                after = time.perf_counter()
+                if result.first_byte is None:
+                    result.first_byte = after - start
+                result.latencies.append(after - before)
+                digest.update(chunk[:written])
+                result.bytes += written
+        finally:
+            self.device.close()
+        result.elapsed = time.perf_counter() - start
+        result.checksum = digest.hexdigest()
+        printv(f"Wrote {result.bytes} bytes to {self.device.path} in {result.elapsed:.3f}s")
+        return result
+
+    def read(self, volume: Optional[int] = None) -> BenchmarkResult:
+        """Reads from the start of the device until volume bytes (or end of data) are read"""
+        result = BenchmarkResult("read", self.mover, self.block_size)
+        digest = hashlib.sha1()
+        start = time.perf_counter()
+        self.device.open("r")
+        try:
+            self.device.rewind()
+            while volume is None or result.bytes < volume:
+                size = self.block_size if volume is None else min(self.block_size, volume - result.bytes)
+                before = time.perf_counter()
+                chunk = self.device.read(size)
+                after = time.perf_counter()
+                if not chunk:
+                    break
+                if result.first_byte is None:
+                    result.first_byte = after - start
+                result.latencies.append(after - before)
+                digest.update(chunk)
+                result.bytes += len(chunk)
+        finally:
+            self.device.close()
+        result.elapsed = time.perf_counter() - start
+        result.checksum = digest.hexdigest()
+        printv(f"Read {result.bytes} bytes from {self.device.path} in {result.elapsed:.3f}s")
+        return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mover device throughput benchmark")
+    parser.add_argument('-d', '--device', required=True, help="Tape character device (e.g. /dev/nst0), or a file with --fake.")
+    parser.add_argument('--fake', action='store_true', help="Use --device as a regular file standing in for a tape; it is created or overwritten.")
+    parser.add_argument('-m', '--mover', default="fake", help="Mover type, recorded in the results (default: fake).")
+    parser.add_argument('--volume', type=int, default=1024, help="MB to write and read back (default: 1024).")
+    parser.add_argument('--block-size', type=int, default=256, help="Block size in KB (default: 256).")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+    parser.add_argument('--metrics', action='store_true', help="Also print SDS_METRIC lines so runs through cli.py are recorded in the run history.")
+    args = parser.parse_args()
+
+    if not args.fake and not TapeDevice(args.device).is_tape:
+        parser.error(f"{args.device} is not a tape character device (use --fake to benchmark a file)")
+    benchmark = MoverBenchmark(args.device, args.mover, args.block_size * 1024, args.fake)
+    write = benchmark.write(args.volume * MB)
+    read = benchmark.read(write.bytes)
+    if read.checksum != write.checksum:
+        print(f"Read back data does not match what was written to {args.device}")
+    if args.json:
+        print(json.dumps([write.to_dict(), read.to_dict()], indent=4))
+    else:
+        print(write.get())
+        print(read.get())
+    if args.metrics:
+        for result in [write, read]:
+            for name, value in result.to_dict().items():
+                if isinstance(value, float):
+                    print(f"SDS_METRIC {result.operation}_{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import json
+import sys
+
+import pytest
+
+from tests.enstore.scripts import encp_load
+from tests.enstore.scripts.encp_load import EncpLoad, SizeDistribution
+
+
+def test_uniform_sizes_are_a_bounded_set():
+    sizes = SizeDistribution("uniform:1K-1G")
+    assert len(sizes.sizes) == 16
+    assert {sizes.sample() for _ in range(1000)} <= set(sizes.sizes)
+
+
+def test_load_with_cp_stub(tmp_path):
+    pnfs, local = tmp_path / "pnfs", tmp_path / "local"
+    pnfs.mkdir()
+    local.mkdir()
+    load = EncpLoad("cp", str(pnfs), str(local), SizeDistribution("uniform:1K-64K"), read_fraction=0.5)
+    run = load.run(concurrency=4, transfers=40)
+    assert run["failed"] == 0 and run["reads"] and run["writes"]
+    assert run["bytes"] == sum(record["bytes"] for record in run["records"])
+    assert len(list(local.glob("source_*"))) <= 16
+
+
+def test_main_reports_failed_transfers(tmp_path, monkeypatch):
+    report = tmp_path / "runs.json"
+    monkeypatch.setattr(sys, "argv", [
+        "encp_load", "--encp", "false", "--pnfs-dir", str(tmp_path), "-c", "1", "2", "-t", "3", "--sizes", "fixed:4K", "--json", str(report),
+    ])
+    with pytest.raises(SystemExit) as exit:
+        encp_load.main()
+    assert exit.value.code == 1
+    assert [run["failed"] for run in json.loads(report.read_text())] == [3, 3]
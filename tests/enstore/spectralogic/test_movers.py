@@ -1,9 +1,54 @@
+import os
+
 import pytest
 
-def test_spectralogic_tape_read():
-    # Your test logic here
-    assert True
+from tests.enstore.scripts.mover_benchmark import MB, MoverBenchmark, TapeDevice, percentile
+
+# Point SDS_BENCH_DEVICE at a real drive (e.g. /dev/nst0) to benchmark hardware instead of a file
+VOLUME = int(os.environ.get("SDS_BENCH_VOLUME_MB", 8)) * MB
+BLOCK_SIZE = int(os.environ.get("SDS_BENCH_BLOCK_KB", 256)) * 1024
+
+
+@pytest.fixture
+def benchmark(tmp_path):
+    device = os.environ.get("SDS_BENCH_DEVICE")
+    if device:
+        return MoverBenchmark(device, mover="spectralogic", block_size=BLOCK_SIZE)
+    return MoverBenchmark(str(tmp_path / "fake_tape"), mover="spectralogic", block_size=BLOCK_SIZE, fake=True)
+
+
+def test_spectralogic_tape_write(benchmark):
+    result = benchmark.write(VOLUME)
+    print(result.get())
+    assert result.bytes == VOLUME
+    assert len(result.latencies) == -(-VOLUME // BLOCK_SIZE)
+    assert result.throughput > 0
+    assert 0 < result.first_byte <= result.elapsed
+    stats = result.to_dict()
+    assert stats["block_latency_p50_s"] <= stats["block_latency_p95_s"] <= stats["block_latency_p99_s"]
+
+
+def test_spectralogic_tape_read(benchmark):
+    written = benchmark.write(VOLUME)
+    result = benchmark.read(VOLUME)
+    print(result.get())
+    assert result.bytes == VOLUME
+    assert result.checksum == written.checksum
+    assert result.throughput > 0
+    assert 0 < result.first_byte <= result.elapsed
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([], 95) == 0.0
+
 
-def test_spectralogic_tape_write():
-    # Your test logic here
-    assert True
+def test_only_tape_devices_are_opened_unless_faked(tmp_path):
+    path = tmp_path / "not_a_tape"
+    with pytest.raises(ValueError):
+        TapeDevice(str(path)).open("w")
+    assert not path.exists()
+    with pytest.raises(ValueError):
+        TapeDevice(str(tmp_path), fake=True).open("w")
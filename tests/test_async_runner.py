@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+import pytest
+
+from models.async_runner import TIMEOUT_EXIT_CODE, run_shell
+from models.operator import Operator
+
+
+def _gone(pid):
+    return not os.path.exists(f"/proc/{pid}") or open(f"/proc/{pid}/stat").read().split()[2] == "Z"
+
+
+def test_timeout_kills_the_command():
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run_shell("sleep 5", timeout=0.2))
+    assert time.monotonic() - start < 2
+
+
+def test_semaphore_bounds_concurrent_commands():
+    async def main():
+        semaphore = asyncio.Semaphore(2)
+        return await asyncio.gather(*(run_shell("sleep 0.3; echo done", semaphore=semaphore) for _ in range(4)))
+
+    start = time.monotonic()
+    results = asyncio.run(main())
+    elapsed = time.monotonic() - start
+    assert results == [(0, "done\n", "")] * 4
+    assert 0.6 <= elapsed < 1.2
+
+
+def test_cancelled_task_kills_the_command(tmp_path):
+    marker = tmp_path / "pid"
+
+    async def main():
+        task = asyncio.ensure_future(run_shell(f"echo $$ > {marker}; exec sleep 30"))
+        while not marker.exists() or not marker.read_text().strip():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert _gone(int(marker.read_text()))
+
+
+def test_operator_timeout_fails_the_run():
+    args = argparse.Namespace(user="root", node=socket.gethostname(), suite="cta", quiet=False, verbose=False, run=None)
+    operator = Operator(args, None)
+    operator.defer_output = True
+    asyncio.run(operator.arun_command(["sleep 5"], timeout=0.2))
+    assert operator.error.startswith("Command timed out after 0.2s")
+    assert operator.steps[-1]["exit_code"] == TIMEOUT_EXIT_CODE
@@ -0,0 +1,24 @@
+import argparse
+import socket
+
+from models.history import History
+from models.operator import Operator
+
+
+def _operator():
+    args = argparse.Namespace(user="root", node=socket.gethostname(), suite="cta", quiet=False, verbose=False, run=None)
+    operator = Operator(args, None)
+    operator.defer_output = True
+    return operator
+
+
+def test_cmd_runs_are_keyed_by_their_command(tmp_path):
+    history = History(str(tmp_path / "history.jsonl"))
+    keys = []
+    for command in ["echo a", "echo b", "echo a", "echo a", "echo a"]:
+        operator = _operator()
+        operator.run_command([command])
+        keys.append(history.record(operator, None, 0.1)["workflow"])
+    assert keys[0] == keys[2] != keys[1] and keys[0].startswith("cmd:")
+    assert [step["command"] for step in next(history.records())["steps"]] == ["echo a"]
+    assert {finding["workflow"] for finding in history.compare("cmd", baseline=2, recent=2)} == {keys[0]}
@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+import models.manifest
+from models.cache import TTLCache
+from models.manifest import WorkflowManifest
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """A synthetic workflows.json of many small workflows, kept out of the real catalog"""
+    monkeypatch.setattr(models.manifest, "_manifests", TTLCache("manifests", ttl=float("inf"), directory=str(tmp_path / "cache")))
+    workflows = {
+        f"check_drive_{i}": {
+            "title": f"check_drive_{i}",
+            "description": "Checks drive status",
+            "requirements": {"service": "cta"},
+            "commands": ["echo drive $drive"],
+            "params": [{"name": "drive", "description": "Drive", "type": "string", "required": False}],
+        }
+        for i in range(300)
+    }
+    workflows["broken"] = {"title": "broken", "description": "No commands"}
+    path = tmp_path / "workflows.json"
+    path.write_text(json.dumps(workflows))
+    return str(path)
+
+
+def test_manifest_compiles_once_and_skips_invalid(catalog):
+    manifest = WorkflowManifest.load("cta", catalog)
+    assert len(manifest) == 300 and "broken" not in manifest
+    assert manifest.search("drive_29") == ["check_drive_29"] + [f"check_drive_{i}" for i in range(290, 300)]
+    assert manifest["check_drive_5"].name == "check_drive_5"
+
+    # Touched but unchanged: served from the compiled manifest
+    os.utime(catalog)
+    assert WorkflowManifest.load("cta", catalog).definitions == manifest.definitions
@@ -0,0 +1,19 @@
+import argparse
+import socket
+
+from models.operator import Operator
+
+MOVERS = {
+    0: {"device_type": "mediumx", "mover_type": "SPECTRA", "slot": "/dev/sg0"},
+    1: {"device_type": "disk", "mover_type": "ATA", "slot": "/dev/sda"},
+    2: {"device_type": "tape", "mover_type": "IBM", "slot": "/dev/sg2"},
+    3: {"device_type": "tape", "mover_type": "IBM", "slot": "/dev/sg3"},
+}
+
+
+def test_all_movers_policy_only_uses_tape_drives():
+    args = argparse.Namespace(user="root", node=socket.gethostname(), suite="cta", quiet=False, verbose=False, mover_policy="all")
+    operator = Operator(args, None)
+    operator.movers = MOVERS
+    assert list(operator.tape_movers()) == ["/dev/sg2", "/dev/sg3"]
+    assert operator._select_remote_mover(MOVERS)["slot"] == "/dev/sg2"
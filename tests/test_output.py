@@ -0,0 +1,37 @@
+import io
+import threading
+import time
+
+from models.output import OutputPipeline, tagged
+
+
+def _pipeline():
+    stream = io.StringIO()
+    pipeline = OutputPipeline(stream)
+    pipeline.running = True
+    pipeline._thread = threading.Thread(target=pipeline._write_loop, daemon=True)
+    pipeline._thread.start()
+    return pipeline, stream
+
+
+def test_untagged_output_follows_buffered_worker_lines():
+    pipeline, stream = _pipeline()
+    pipeline.emit(("header",))
+    with tagged(node="a"):
+        pipeline.emit(("from a",))
+    pipeline.emit(("summary",))
+    pipeline.flush()
+    assert stream.getvalue() == "header\nfrom a\nsummary\n"
+
+
+def test_chatty_source_does_not_hold_back_others():
+    pipeline, stream = _pipeline()
+    with tagged(node="quiet"):
+        pipeline.emit(("partial",))
+    deadline = time.monotonic() + 0.5
+    with tagged(node="chatty"):
+        while "partial" not in stream.getvalue() and time.monotonic() < deadline:
+            pipeline.emit(("noise",))
+            time.sleep(0.001)
+    assert "partial" in stream.getvalue()
+    pipeline.flush()
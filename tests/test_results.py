@@ -0,0 +1,73 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import models.operator
+from models.operator import Operator
+from models.results import ResultStore
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _spool(directory, compress):
+    store = ResultStore(str(directory))
+    store.enable(compress)
+    path = store.reserve("node1", "write")
+    lines = [f"line {i}" for i in range(1, 3001)] + ["foo", "bar", "foo  bar", "Done"]
+    store.write(path, "\n".join(lines), "warning: slow\n")
+    store.commit(path, node="node1", workflow="wf", step="write", exit_code=0)
+    return store
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_search_finds_lines_with_their_numbers(tmp_path, compress):
+    store = _spool(tmp_path, compress)
+    entry = next(store.entries())
+    assert entry["lines"] == 3005 and entry["path"].endswith(".log.gz" if compress else ".log")
+    assert [(m["line_number"], m["line"]) for m in store.search(r"^line 2049$")] == [(2049, "line 2049")]
+    assert [m["line_number"] for m in store.search("done", ignore_case=True)] == [3004]
+    assert [m["line"] for m in store.search("slow")] == ["[stderr] warning: slow"]
+    assert len(list(store.search("line", limit=5))) == 5
+    assert list(store.search("line 1", node="other")) == []
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_matches_never_span_lines(tmp_path, compress):
+    store = _spool(tmp_path, compress)
+    assert [(m["line_number"], m["line"]) for m in store.search(r"foo\s+bar")] == [(3003, "foo  bar")]
+
+
+def test_results_subcommand(tmp_path):
+    _spool(tmp_path, compress=False)
+    env = {**os.environ, "SDS_RESULTS_DIR": str(tmp_path)}
+
+    def cli(*args):
+        return subprocess.run([sys.executable, "cli.py", *args], cwd=REPO, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    found = cli("results", "search", "^line 42$", "-w", "wf")
+    assert found.returncode == 0 and found.stdout.strip().endswith(":42: line 42")
+    assert cli("results", "search", "absent").returncode == 1
+    listed = cli("results", "list")
+    assert "node1 wf" in listed.stdout and "3005 lines" in listed.stdout
+    rejected = cli("--compress-results", "-c", "true")
+    assert rejected.returncode == 2 and "--compress-results requires --save-results" in rejected.stderr
+
+
+def test_saved_command_output_is_spooled_as_it_arrives(tmp_path, monkeypatch, capsys):
+    store = ResultStore(str(tmp_path))
+    store.enable()
+    monkeypatch.setattr(models.operator, "RESULTS", store)
+    args = argparse.Namespace(user="root", node=socket.gethostname(), suite="cta", quiet=False, verbose=False, run=None)
+    operator = Operator(args, None)
+    operator.defer_output = True
+    operator.run_command(["seq 1 3000", "echo warn >&2"])
+    assert capsys.readouterr().out == ""
+    entry = next(store.entries())
+    assert entry["lines"] == 3001 and entry["exit_code"] == 0
+    assert sorted(m["line"] for m in store.search("^(3000|.*warn)$")) == ["3000", "[stderr] warn"]
+    # Only the tail is held for the console
+    assert operator.results[0][1].splitlines()[0] == "2001"
@@ -0,0 +1,55 @@
+import os
+import time
+
+from models.helpers import Runner
+from models.metrics import METRICS
+from models.settings import Configuration
+
+
+def test_stream_closed_early_does_not_deadlock():
+    runner = Runner(Configuration(service="cta"))
+    runner.add_commands(["yes line | head -n 200000"])
+    stream = runner.stream(echo=False)
+    assert next(stream) == ("stdout", "line\n")
+    stream.close()
+    assert runner.returncode is not None
+
+
+def test_spool_lines_are_labelled_with_node(tmp_path):
+    spool, capture = tmp_path / "spool.log", tmp_path / "capture.log"
+    runner = Runner(Configuration(service="cta"))
+    runner.add_commands(["echo out", "echo err >&2"])
+    list(runner.stream(spool=str(spool), echo=False, capture=str(capture)))
+    assert sorted(spool.read_text().splitlines()) == ["[local] [stderr] err", "[local] out"]
+    assert sorted(capture.read_text().splitlines()) == ["[stderr] err", "out"]
+
+
+def test_stream_closed_early_stops_child_processes(tmp_path):
+    marker = tmp_path / "child.pid"
+    runner = Runner(Configuration(service="cta"))
+    runner.add_commands([f"bash -c 'sleep 30 & echo $! > {marker}; echo started; wait'"])
+    stream = runner.stream(echo=False)
+    assert next(stream) == ("stdout", "started\n")
+    stream.close()
+    pid = int(marker.read_text())
+    for _ in range(50):
+        if not os.path.exists(f"/proc/{pid}") or open(f"/proc/{pid}/stat").read().split()[2] == "Z":
+            break
+        time.sleep(0.1)
+    else:
+        raise AssertionError("background child outlived the closed stream")
+
+
+def test_stream_joins_lines_longer_than_the_read_size():
+    runner = Runner(Configuration(service="cta"))
+    runner.add_commands(["head -c 200000 /dev/zero | tr '\\0' x; echo; echo done"])
+    lines = [line for _, line in runner.stream(echo=False)]
+    assert lines == ["x" * 200000 + "\n", "done\n"]
+
+
+def test_command_metrics_are_labelled_with_the_bare_node():
+    runner = Runner(Configuration("metrics-node.example", "cta"), user="root")
+    runner.returncode = 0
+    runner.observe(0.1)
+    rendered = METRICS.render(False)
+    assert 'node="metrics-node.example"' in rendered and "root@metrics-node.example" not in rendered
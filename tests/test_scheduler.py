@@ -0,0 +1,106 @@
+import argparse
+import socket
+import threading
+import time
+
+import pytest
+
+from models.manifest import WorkflowManifest
+from models.operator import Operator
+from models.scheduler import StepScheduler
+from models.workflow import Workflow
+
+
+def test_independent_steps_overlap_and_dependents_wait():
+    steps = {"a": {}, "b": {}, "c": {"needs": ["a", "b"]}}
+    started, finished = {}, {}
+    lock = threading.Lock()
+
+    def execute(name, step):
+        with lock:
+            started[name] = time.monotonic()
+        time.sleep(0.1)
+        with lock:
+            finished[name] = time.monotonic()
+        return True
+
+    results = StepScheduler(steps, max_workers=4).run(execute)
+    assert [status["status"] for status in results.values()] == ["ok", "ok", "ok"]
+    assert started["b"] < finished["a"] and started["a"] < finished["b"]
+    assert started["c"] >= max(finished["a"], finished["b"])
+
+
+def test_failed_step_skips_its_dependents_only():
+    steps = {"a": {}, "b": {"needs": ["a"]}, "c": {"needs": ["b"]}, "d": {}}
+    ran = []
+
+    def execute(name, step):
+        ran.append(name)
+        if name == "a":
+            raise RuntimeError("boom")
+        return True
+
+    results = StepScheduler(steps).run(execute)
+    assert {name: result["status"] for name, result in results.items()} == {"a": "failed", "b": "skipped", "c": "skipped", "d": "ok"}
+    assert sorted(ran) == ["a", "d"]
+
+
+def test_cycles_and_unknown_steps_are_rejected():
+    with pytest.raises(SystemExit):
+        StepScheduler({"a": {"needs": ["b"]}, "b": {"needs": ["a"]}})
+    with pytest.raises(SystemExit):
+        StepScheduler({"a": {"needs": ["missing"]}})
+
+
+def test_manifest_validates_steps():
+    definition = {
+        "title": "t",
+        "description": "d",
+        "steps": {"a": {"commands": ["true", 1]}, "b": {"commands": ["true"], "needs": "a"}, "c": {"commands": ["true"], "needs": ["x"]}},
+    }
+    problems = WorkflowManifest.validate("t", definition)
+    assert any("'a'" in problem for problem in problems)
+    assert any("'b'" in problem for problem in problems)
+    assert any("'c'" in problem and "x" in problem for problem in problems)
+
+
+def test_step_records_keep_declaration_order_and_silent_steps_succeed():
+    args = argparse.Namespace(user="root", node=socket.gethostname(), suite="cta", quiet=False, verbose=False, run="steps", jobs=4)
+    operator = Operator(args, None)
+    operator.defer_output = True
+    workflow = Workflow({
+        "title": "steps",
+        "description": "d",
+        "requirements": {},
+        "params": [],
+        "steps": {
+            "slow": {"commands": ["sleep 0.2", "echo slow"]},
+            "silent": {"commands": ["true"]},
+            "after": {"commands": ["echo after"], "needs": ["silent"]},
+        },
+    }, "steps")
+    results = workflow.run(operator, argparse.Namespace())
+    assert [result["status"] for result in results.values()] == ["ok", "ok", "ok"]
+    assert [record["step"] for record in operator.steps] == ["slow", "silent", "after"]
+    assert [stdout for _, stdout, _ in operator.results] == ["slow\n", "after\n"]
+
+
+def test_failed_steps_fail_the_run_and_deferred_summary_is_printed(capsys):
+    args = argparse.Namespace(user="root", node=socket.gethostname(), suite="cta", quiet=False, verbose=False, run="steps", jobs=4)
+    operator = Operator(args, None)
+    operator.defer_output = True
+    workflow = Workflow({
+        "title": "steps",
+        "description": "d",
+        "requirements": {},
+        "params": [],
+        "steps": {
+            "broken": {"commands": ["false"]},
+            "after": {"commands": ["echo after"], "needs": ["broken"]},
+        },
+    }, "steps")
+    workflow.run(operator, argparse.Namespace())
+    assert operator.error == "step(s) failed: broken (failed), after (skipped)"
+    assert capsys.readouterr().out == ""
+    operator.print_results()
+    assert "Workflow steps: 0/2 succeeded" in capsys.readouterr().out